@@ -1,12 +1,12 @@
 # app.py
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, request, jsonify, send_file
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import timedelta
+from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+from extensions import db
 
 load_dotenv()
 
@@ -16,7 +16,7 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 
-db = SQLAlchemy(app)
+db.init_app(app)
 jwt = JWTManager(app)
 CORS(app)
 
@@ -26,18 +26,37 @@ from models.log import SyncLog
 from services.notion_service import NotionService
 from services.sheets_service import SheetsService
 from services.sync_engine import SyncEngine
-from auth.oauth import OAuth
+from services.cache import create_response_cache
+from services.quota import create_quota_manager
+from services.single_flight import SingleFlight
+from services.snapshot_store import SnapshotStore
+from services.transform_pool import TransformPool
+from services import metrics
+from auth.oauth import OAuth, OAuthStateError
+from auth.state_store import create_state_store
+from config import Config
 
 # Initialize services
-notion_service = NotionService()
-sheets_service = SheetsService()
-sync_engine = SyncEngine(notion_service, sheets_service)
-oauth = OAuth()
+response_cache = create_response_cache(Config.CACHE_BACKEND, Config.REDIS_URL, Config.CACHE_DEFAULT_TTL)
+body_cache = create_response_cache(Config.CACHE_BACKEND, Config.REDIS_URL, max_entries=Config.BODY_CACHE_ENTRIES)
+quota_manager = create_quota_manager(Config.QUOTA_BACKEND, Config.REDIS_URL)
+notion_service = NotionService(response_cache, quota_manager, SingleFlight(Config.FETCH_SHARE_WINDOW),
+                               body_cache=body_cache)
+sheets_service = SheetsService(response_cache, quota_manager, SingleFlight(Config.FETCH_SHARE_WINDOW))
+snapshot_store = SnapshotStore(Config.SNAPSHOT_DIR)
+sync_engine = SyncEngine(notion_service, sheets_service, quota=quota_manager, snapshots=snapshot_store,
+                         profile_dir=Config.PROFILE_DIR,
+                         transform_pool=TransformPool(Config.TRANSFORM_WORKERS, Config.TRANSFORM_MIN_ROWS))
+oauth = OAuth(create_state_store(Config.OAUTH_STATE_BACKEND, Config.REDIS_URL))
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy'}), 200
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return metrics.REGISTRY.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
 @app.route('/auth/notion', methods=['POST'])
 @jwt_required()
 def auth_notion():
@@ -56,6 +75,47 @@ def auth_google():
     auth_url = oauth.get_google_auth_url(user_id, redirect_uri)
     return jsonify({'auth_url': auth_url}), 200
 
+@app.route('/auth/notion/callback', methods=['POST'])
+def auth_notion_callback():
+    data = request.get_json() or {}
+    try:
+        user_id, token = oauth.complete_notion_auth(data.get('code', ''), data.get('state', ''),
+                                                    data.get('redirect_uri'))
+    except OAuthStateError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Token exchange failed: {str(e)}'}), 502
+    
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    user.notion_access_token = token.get('access_token')
+    user.notion_refresh_token = token.get('refresh_token') or user.notion_refresh_token
+    db.session.commit()
+    return jsonify({'message': 'Notion connected', 'workspace_name': token.get('workspace_name')}), 200
+
+@app.route('/auth/google/callback', methods=['POST'])
+def auth_google_callback():
+    data = request.get_json() or {}
+    try:
+        user_id, token = oauth.complete_google_auth(data.get('code', ''), data.get('state', ''),
+                                                    data.get('redirect_uri'))
+    except OAuthStateError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Token exchange failed: {str(e)}'}), 502
+    
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    user.google_access_token = token.get('access_token')
+    # Google only returns a refresh token on the first consent
+    user.google_refresh_token = token.get('refresh_token') or user.google_refresh_token
+    db.session.commit()
+    return jsonify({'message': 'Google connected'}), 200
+
 @app.route('/sync/create', methods=['POST'])
 @jwt_required()
 def create_sync():
@@ -76,7 +136,10 @@ def create_sync():
             mapping=data.get('mapping', {}),
             filters=data.get('filters', {}),
             frequency=data.get('frequency', 'daily'),
-            sync_direction=data.get('sync_direction', 'both')
+            sync_direction=data.get('sync_direction', 'both'),
+            adaptive_schedule=bool(data.get('adaptive_schedule', False)),
+            profiling_enabled=bool(data.get('profiling_enabled', False)),
+            propagate_deletions=bool(data.get('propagate_deletions', False))
         )
         
         db.session.add(sync)
@@ -101,12 +164,97 @@ def run_sync(sync_id):
         if not sync:
             return jsonify({'error': 'Sync not found'}), 404
         
-        result = sync_engine.run_sync(sync)
+        data = request.get_json(silent=True) or {}
+        profile = bool(data.get('profile')) or request.args.get('profile', '').lower() in ('1', 'true')
+        
+        # A manual run must see edits made since any recent shared fetch
+        result = sync_engine.run_sync(sync, profile=profile, reuse_recent=False)
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sync/preview/<int:sync_id>', methods=['POST'])
+@jwt_required()
+def preview_sync(sync_id):
+    try:
+        user_id = get_jwt_identity()
+        sync = Sync.query.filter_by(id=sync_id, user_id=user_id).first()
+        
+        if not sync:
+            return jsonify({'error': 'Sync not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        result = sync_engine.preview_sync(
+            sync,
+            mapping=data.get('mapping'),
+            filters=data.get('filters'),
+            limit=data.get('limit', 25)
+        )
         return jsonify(result), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/quota/usage', methods=['GET'])
+@jwt_required()
+def get_quota_usage():
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify(quota_manager.get_usage(user.id, user.plan_type)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/syncs', methods=['GET'])
+@jwt_required()
+def list_syncs():
+    """All of the user's syncs with their last run and recent run stats, in a fixed number of queries"""
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        days = max(1, min(request.args.get('days', 30, type=int), 90))
+        syncs = Sync.query.filter_by(user_id=user_id).order_by(Sync.created_at.desc()).all()
+        latest_runs = SyncLog.latest_runs(user_id)
+        run_stats = SyncLog.run_stats(user_id, datetime.utcnow() - timedelta(days=days))
+        
+        overview = []
+        for sync in syncs:
+            item = sync.to_dict()
+            last_run = latest_runs.get(sync.id)
+            item['last_run'] = last_run.to_dict() if last_run else None
+            item['stats'] = run_stats.get(sync.id, {
+                'runs': 0,
+                'errors': 0,
+                'error_rate': 0.0,
+                'avg_duration_seconds': None,
+                'rows_processed': 0
+            })
+            overview.append(item)
+        
+        limit = user.sync_limit()
+        return jsonify({
+            'syncs': overview,
+            'stats_window_days': days,
+            'plan': {
+                'plan_type': user.plan_type,
+                'sync_limit': limit,
+                'sync_count': len(syncs),
+                'can_create_sync': limit == -1 or len(syncs) < limit
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/sync/<int:sync_id>/logs', methods=['GET'])
 @jwt_required()
 def get_sync_logs(sync_id):
@@ -132,6 +280,33 @@ def get_sync_logs(sync_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/sync/<int:sync_id>/logs/<int:log_id>/profile', methods=['GET'])
+@jwt_required()
+def get_sync_profile(sync_id, log_id):
+    try:
+        user_id = get_jwt_identity()
+        sync = Sync.query.filter_by(id=sync_id, user_id=user_id).first()
+        
+        if not sync:
+            return jsonify({'error': 'Sync not found'}), 404
+        
+        log = SyncLog.query.filter_by(id=log_id, sync_id=sync_id).first()
+        if not log or not log.profile_path or not os.path.exists(log.profile_path):
+            return jsonify({'error': 'Profile not found'}), 404
+        
+        # Raw cProfile stats for snakeviz/pstats, next to the JSON summary
+        if request.args.get('format') == 'pstats':
+            stats_path = log.profile_path[:-len('.json')] + '.prof'
+            if not os.path.exists(stats_path):
+                return jsonify({'error': 'Profile not found'}), 404
+            return send_file(os.path.abspath(stats_path), as_attachment=True,
+                             download_name=f'sync_{sync_id}_log_{log_id}.prof')
+        
+        return send_file(os.path.abspath(log.profile_path), mimetype='application/json')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
@@ -1,24 +1,32 @@
 # auth/oauth.py
+import hashlib
 import os
 import secrets
+from typing import Callable, Tuple
 from urllib.parse import urlencode
 import requests
-from flask import current_app
+from auth.state_store import MemoryStateStore
+
+class OAuthStateError(Exception):
+    """The callback's state is unknown, expired or already used"""
+
 
 class OAuth:
-    def __init__(self):
+    # How long a user has to finish the provider's consent screen
+    STATE_TTL = 600
+    # How long an exchange result is kept so a retried callback gets the same tokens
+    EXCHANGE_TTL = 600
+
+    def __init__(self, state_store=None):
         self.notion_client_id = os.getenv('NOTION_CLIENT_ID')
         self.notion_client_secret = os.getenv('NOTION_CLIENT_SECRET')
         self.google_client_id = os.getenv('GOOGLE_CLIENT_ID')
         self.google_client_secret = os.getenv('GOOGLE_CLIENT_SECRET')
+        self.state_store = state_store or MemoryStateStore()
 
     def get_notion_auth_url(self, user_id: str, redirect_uri: str) -> str:
         """Generate Notion OAuth URL"""
-        state = secrets.token_urlsafe(32)
-        
-        # Store state with user_id for verification (use Redis in production)
-        current_app.config['oauth_states'] = current_app.config.get('oauth_states', {})
-        current_app.config['oauth_states'][state] = user_id
+        state = self._issue_state('notion', user_id)
         
         params = {
             'client_id': self.notion_client_id,
@@ -32,11 +40,7 @@ class OAuth:
 
     def get_google_auth_url(self, user_id: str, redirect_uri: str) -> str:
         """Generate Google OAuth URL"""
-        state = secrets.token_urlsafe(32)
-        
-        # Store state with user_id for verification
-        current_app.config['oauth_states'] = current_app.config.get('oauth_states', {})
-        current_app.config['oauth_states'][state] = user_id
+        state = self._issue_state('google', user_id)
         
         params = {
             'client_id': self.google_client_id,
@@ -50,6 +54,14 @@ class OAuth:
         
         return f"https://accounts.google.com/o/oauth2/v2/auth?{urlencode(params)}"
 
+    def complete_notion_auth(self, code: str, state: str, redirect_uri: str) -> Tuple[str, dict]:
+        """Verify the callback state and exchange the code; returns (user_id, token_data)"""
+        return self._complete('notion', code, state, lambda: self.exchange_notion_code(code, redirect_uri))
+
+    def complete_google_auth(self, code: str, state: str, redirect_uri: str) -> Tuple[str, dict]:
+        """Verify the callback state and exchange the code; returns (user_id, token_data)"""
+        return self._complete('google', code, state, lambda: self.exchange_google_code(code, redirect_uri))
+
     def exchange_notion_code(self, code: str, redirect_uri: str) -> dict:
         """Exchange Notion authorization code for access token"""
         url = "https://api.notion.com/v1/oauth/token"
@@ -81,4 +93,37 @@ class OAuth:
         response = requests.post(url, data=data)
         response.raise_for_status()
         
-        return response.json()
\ No newline at end of file
+        return response.json()
+
+    def _issue_state(self, provider: str, user_id) -> str:
+        state = secrets.token_urlsafe(32)
+        self.state_store.put(f'state:{state}', {'provider': provider, 'user_id': user_id}, self.STATE_TTL)
+        return state
+
+    def _complete(self, provider: str, code: str, state: str, exchange: Callable[[], dict]) -> Tuple[str, dict]:
+        """Consume the state once and exchange the code.
+
+        Codes are single-use, so the exchange result is kept briefly under a
+        hash of the code: a callback retried (on any worker) with the same
+        code and state gets the same tokens instead of a provider error.
+        """
+        exchange_key = f'exchange:{provider}:{hashlib.sha256(code.encode()).hexdigest()}'
+        state_hash = hashlib.sha256(state.encode()).hexdigest()
+        
+        cached = self.state_store.get(exchange_key)
+        if cached is not None:
+            if cached['state'] != state_hash:
+                raise OAuthStateError('Authorization code was issued for a different state')
+            return cached['user_id'], cached['token']
+        
+        entry = self.state_store.pop(f'state:{state}')
+        if entry is None or entry.get('provider') != provider:
+            raise OAuthStateError('Unknown or expired OAuth state')
+        
+        token = exchange()
+        self.state_store.put(
+            exchange_key,
+            {'state': state_hash, 'user_id': entry['user_id'], 'token': token},
+            self.EXCHANGE_TTL
+        )
+        return entry['user_id'], token
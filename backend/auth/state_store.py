@@ -0,0 +1,137 @@
+# auth/state_store.py
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from extensions import db
+from models.oauth_state import OAuthState
+
+try:
+    import redis
+except ImportError:  # Redis store is optional
+    redis = None
+
+
+class MemoryStateStore:
+    """Expiring key/value store for one process, bounded by LRU eviction"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, value: Any, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Remove and return a value; only one caller ever gets it"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+
+class RedisStateStore:
+    """Expiring key/value store shared across processes via Redis"""
+
+    def __init__(self, redis_url: str, namespace: str = 'bettersync:oauth:'):
+        if redis is None:
+            raise RuntimeError('redis package is not installed')
+        self.client = redis.Redis.from_url(redis_url)
+        self.namespace = namespace
+
+    def put(self, key: str, value: Any, ttl: int):
+        self.client.set(self.namespace + key, json.dumps(value), ex=ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.namespace + key)
+        return json.loads(raw) if raw is not None else None
+
+    def pop(self, key: str) -> Optional[Any]:
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(self.namespace + key)
+        pipe.delete(self.namespace + key)
+        raw, _ = pipe.execute()
+        return json.loads(raw) if raw is not None else None
+
+
+class DatabaseStateStore:
+    """Expiring key/value store in the application database, for deployments without Redis"""
+
+    # Expired rows are purged on roughly one write in this many
+    PURGE_EVERY = 100
+
+    def __init__(self):
+        self._writes = 0
+        self.logger = logging.getLogger(__name__)
+
+    def put(self, key: str, value: Any, ttl: int):
+        db.session.merge(OAuthState(
+            key=key,
+            value=value,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        ))
+        db.session.commit()
+
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge_expired()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = OAuthState.query.get(key)
+        if entry is None or entry.expires_at <= datetime.utcnow():
+            return None
+        return entry.value
+
+    def pop(self, key: str) -> Optional[Any]:
+        entry = OAuthState.query.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry.value, entry.expires_at
+        # The delete's row count decides which concurrent caller owns the value
+        deleted = OAuthState.query.filter_by(key=key).delete()
+        db.session.commit()
+        if not deleted or expires_at <= datetime.utcnow():
+            return None
+        return value
+
+    def _purge_expired(self):
+        try:
+            OAuthState.query.filter(OAuthState.expires_at <= datetime.utcnow()).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.logger.warning(f"Failed to purge expired OAuth states: {str(e)}")
+
+
+def create_state_store(backend: str = 'memory', redis_url: str = None, max_entries: int = 10000):
+    """Build an OAuth state store for the configured backend, falling back to memory"""
+    logger = logging.getLogger(__name__)
+
+    if backend == 'redis' and redis_url:
+        try:
+            return RedisStateStore(redis_url)
+        except Exception as e:
+            logger.warning(f"Redis state store unavailable, using in-process store: {str(e)}")
+    elif backend == 'database':
+        return DatabaseStateStore()
+
+    return MemoryStateStore(max_entries)
@@ -31,6 +31,36 @@ class Config:
     # Redis (for production caching/sessions)
     REDIS_URL = os.getenv('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Response cache (memory or redis)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 300))
+    # Notion page bodies have their own store (same backend); size it above the exported page count
+    BODY_CACHE_ENTRIES = int(os.getenv('BODY_CACHE_ENTRIES', 20000))
+    
+    # API quota tracking (redis or memory); memory counts each process separately,
+    # so worker.py refuses it unless WORKER_ALLOW_LOCAL_QUOTA is set
+    QUOTA_BACKEND = os.getenv('QUOTA_BACKEND', 'redis')
+    WORKER_ALLOW_LOCAL_QUOTA = os.getenv('WORKER_ALLOW_LOCAL_QUOTA', 'false').lower() == 'true'
+    
+    # Seconds a finished source fetch is shared with other syncs of the same source
+    FETCH_SHARE_WINDOW = float(os.getenv('FETCH_SHARE_WINDOW', 30))
+    
+    # Local snapshots of last synced rows
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'data/snapshots')
+    
+    # Artifacts from profiled sync runs
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'data/profiles')
+    
+    # OAuth state and token exchange store (memory, redis or database)
+    OAUTH_STATE_BACKEND = os.getenv('OAUTH_STATE_BACKEND', 'memory')
+    
+    # Process pool for flattening large batches of Notion pages (0 workers keeps it in-process)
+    TRANSFORM_WORKERS = int(os.getenv('TRANSFORM_WORKERS', 0))
+    TRANSFORM_MIN_ROWS = int(os.getenv('TRANSFORM_MIN_ROWS', 1000))
+    
+    # Port for the standalone worker's /metrics endpoint (0 disables it)
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', 0))
+    
     # Security
     BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', 60))
@@ -0,0 +1,5 @@
+# extensions.py
+from flask_sqlalchemy import SQLAlchemy
+
+# Created unbound so models and services can import it without importing the web app
+db = SQLAlchemy()
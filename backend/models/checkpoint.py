@@ -0,0 +1,40 @@
+# models/checkpoint.py
+from extensions import db
+from datetime import datetime
+
+class SyncCheckpoint(db.Model):
+    __tablename__ = 'sync_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sync_id = db.Column(db.Integer, db.ForeignKey('syncs.id'), nullable=False, index=True)
+    direction = db.Column(db.String(50), nullable=False)  # notion_to_sheets, sheets_to_notion
+    status = db.Column(db.String(50), default='running')  # running, completed, expired
+    attempts = db.Column(db.Integer, default=1)
+
+    # Read progress (Notion pagination)
+    notion_cursor = db.Column(db.Text)
+    fetch_completed = db.Column(db.Boolean, default=False)
+    fetched_rows = db.Column(db.JSON)  # Transformed rows collected so far, in RowBatch payload form
+    fetched_keys = db.Column(db.JSON)  # Notion page ids, parallel to fetched_rows
+
+    # Write progress
+    committed_batch = db.Column(db.Integer, default=-1)
+    idempotency_keys = db.Column(db.JSON)  # Keys of rows already written
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'sync_id': self.sync_id,
+            'direction': self.direction,
+            'status': self.status,
+            'attempts': self.attempts,
+            'fetch_completed': self.fetch_completed,
+            'rows_fetched': len(self.fetched_keys or []),
+            'committed_batch': self.committed_batch,
+            'rows_committed': len(self.idempotency_keys or []),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,28 +1,87 @@
-# # models/log.py  
-# class SyncLog(db.Model):
-#     __tablename__ = 'sync_logs'
+# models/log.py
+from extensions import db
+from datetime import datetime
+from sqlalchemy import case, func
+from models.sync import Sync
+
+class SyncLog(db.Model):
+    __tablename__ = 'sync_logs'
+    # latest_runs and run_stats filter and partition by sync, ordered by time
+    __table_args__ = (
+        db.Index('ix_sync_logs_sync_id_created_at', 'sync_id', 'created_at'),
+    )
+    
+    # Statuses that end a run; 'started' entries are not runs of their own
+    FINISHED_STATUSES = ('completed', 'error')
     
-#     id = db.Column(db.Integer, primary_key=True)
-#     sync_id = db.Column(db.Integer, db.ForeignKey('syncs.id'), nullable=False)
+    id = db.Column(db.Integer, primary_key=True)
+    sync_id = db.Column(db.Integer, db.ForeignKey('syncs.id'), nullable=False)
     
-#     # Log details
-#     status = db.Column(db.String(50), nullable=False)  # started, completed, error
-#     message = db.Column(db.Text)
-#     rows_processed = db.Column(db.Integer, default=0)
-#     errors = db.Column(db.JSON)
+    # Log details
+    status = db.Column(db.String(50), nullable=False)  # started, completed, error
+    message = db.Column(db.Text)
+    rows_processed = db.Column(db.Integer, default=0)
+    rows_changed = db.Column(db.Integer)
+    errors = db.Column(db.JSON)
     
-#     # Performance metrics
-#     duration_seconds = db.Column(db.Float)
+    # Performance metrics
+    duration_seconds = db.Column(db.Float)
+    profile_path = db.Column(db.String(512))  # Profile summary for profiled runs
     
-#     # Timestamp
-#     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Timestamp
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'message': self.message,
+            'rows_processed': self.rows_processed,
+            'rows_changed': self.rows_changed,
+            'duration_seconds': self.duration_seconds,
+            'has_profile': bool(self.profile_path),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    @classmethod
+    def latest_runs(cls, user_id) -> dict:
+        """Most recent finished run of each of a user's syncs, keyed by sync_id, in one query"""
+        ranked = db.session.query(
+            cls.id.label('id'),
+            func.row_number().over(
+                partition_by=cls.sync_id,
+                order_by=(cls.created_at.desc(), cls.id.desc())
+            ).label('position')
+        ).join(Sync, Sync.id == cls.sync_id)\
+         .filter(Sync.user_id == user_id, cls.status.in_(cls.FINISHED_STATUSES))\
+         .subquery()
+        
+        logs = cls.query.join(ranked, ranked.c.id == cls.id).filter(ranked.c.position == 1).all()
+        return {log.sync_id: log for log in logs}
 
-#     def to_dict(self):
-#         return {
-#             'id': self.id,
-#             'status': self.status,
-#             'message': self.message,
-#             'rows_processed': self.rows_processed,
-#             'duration_seconds': self.duration_seconds,
-#             'created_at': self.created_at.isoformat() if self.created_at else None
-#         }
\ No newline at end of file
+    @classmethod
+    def run_stats(cls, user_id, since: datetime) -> dict:
+        """Run counts, error rate, average duration and rows per sync since a time, in one query"""
+        rows = db.session.query(
+            cls.sync_id,
+            func.count(cls.id),
+            func.sum(case((cls.status == 'error', 1), else_=0)),
+            func.avg(cls.duration_seconds),
+            func.sum(cls.rows_processed)
+        ).join(Sync, Sync.id == cls.sync_id)\
+         .filter(Sync.user_id == user_id,
+                 cls.status.in_(cls.FINISHED_STATUSES),
+                 cls.created_at >= since)\
+         .group_by(cls.sync_id)\
+         .all()
+        
+        return {
+            sync_id: {
+                'runs': runs,
+                'errors': int(errors or 0),
+                'error_rate': round((errors or 0) / runs, 4) if runs else 0.0,
+                'avg_duration_seconds': float(avg_duration) if avg_duration is not None else None,
+                'rows_processed': int(rows_processed or 0)
+            }
+            for sync_id, runs, errors, avg_duration, rows_processed in rows
+        }
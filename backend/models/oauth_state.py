@@ -0,0 +1,12 @@
+# models/oauth_state.py
+from extensions import db
+from datetime import datetime
+
+class OAuthState(db.Model):
+    """Short-lived OAuth state and token exchange entries for DatabaseStateStore"""
+    __tablename__ = 'oauth_states'
+
+    key = db.Column(db.String(255), primary_key=True)
+    value = db.Column(db.JSON)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,56 @@
+# models/sync.py
+from extensions import db
+from datetime import datetime
+
+class Sync(db.Model):
+    __tablename__ = 'syncs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    
+    # Sync configuration
+    name = db.Column(db.String(255), nullable=False)
+    notion_database_id = db.Column(db.String(255), nullable=False)
+    sheet_id = db.Column(db.String(255), nullable=False)
+    
+    # Sync settings
+    mapping = db.Column(db.JSON)  # Field mapping between Notion and Sheets
+    filters = db.Column(db.JSON)  # Conditional filters
+    frequency = db.Column(db.String(50), default='daily')  # realtime, hourly, daily, weekly
+    sync_direction = db.Column(db.String(50), default='both')  # notion_to_sheets, sheets_to_notion, both
+    
+    # Status
+    status = db.Column(db.String(50), default='active')  # active, paused, error
+    last_sync = db.Column(db.DateTime)
+    next_sync = db.Column(db.DateTime)
+    
+    # Adaptive scheduling: next_sync follows the observed change rate
+    adaptive_schedule = db.Column(db.Boolean, default=False)
+    sheet_row_hashes = db.Column(db.JSON)  # Row fingerprints from the last run, for change counts
+    
+    # Profile every scheduled run of this sync
+    profiling_enabled = db.Column(db.Boolean, default=False)
+    
+    # Archive Notion pages whose sheet rows were deleted (sheets_to_notion and both)
+    propagate_deletions = db.Column(db.Boolean, default=False)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    logs = db.relationship('SyncLog', backref='sync', lazy=True, cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'frequency': self.frequency,
+            'sync_direction': self.sync_direction,
+            'adaptive_schedule': self.adaptive_schedule,
+            'propagate_deletions': self.propagate_deletions,
+            'last_sync': self.last_sync.isoformat() if self.last_sync else None,
+            'next_sync': self.next_sync.isoformat() if self.next_sync else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -1,13 +1,23 @@
 # models/user.py
-from app import db
+from extensions import db
+from models.sync import Sync
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import func
 import secrets
 
 class User(db.Model):
     __tablename__ = 'users'
     
+    # Syncs allowed per plan; -1 means unlimited
+    SYNC_LIMITS = {
+        'free': 1,
+        'starter': 3,
+        'pro': 10,
+        'business': -1
+    }
+    
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
@@ -48,18 +58,16 @@ class User(db.Model):
         self.api_key = secrets.token_urlsafe(32)
         return self.api_key
 
+    def sync_limit(self):
+        return self.SYNC_LIMITS.get(self.plan_type, 0)
+
+    def sync_count(self):
+        """Number of syncs, counted in SQL without loading them"""
+        return db.session.query(func.count(Sync.id)).filter(Sync.user_id == self.id).scalar()
+
     def can_create_sync(self):
-        limits = {
-            'free': 1,
-            'starter': 3,
-            'pro': 10,
-            'business': -1  # unlimited
-        }
-        
-        current_count = len(self.syncs)
-        limit = limits.get(self.plan_type, 0)
-        
-        return limit == -1 or current_count < limit
+        limit = self.sync_limit()
+        return limit == -1 or self.sync_count() < limit
 
     def to_dict(self):
         return {
@@ -70,73 +78,3 @@ class User(db.Model):
             'subscription_status': self.subscription_status,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
-
-# models/sync.py
-class Sync(db.Model):
-    __tablename__ = 'syncs'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    
-    # Sync configuration
-    name = db.Column(db.String(255), nullable=False)
-    notion_database_id = db.Column(db.String(255), nullable=False)
-    sheet_id = db.Column(db.String(255), nullable=False)
-    
-    # Sync settings
-    mapping = db.Column(db.JSON)  # Field mapping between Notion and Sheets
-    filters = db.Column(db.JSON)  # Conditional filters
-    frequency = db.Column(db.String(50), default='daily')  # realtime, hourly, daily, weekly
-    sync_direction = db.Column(db.String(50), default='both')  # notion_to_sheets, sheets_to_notion, both
-    
-    # Status
-    status = db.Column(db.String(50), default='active')  # active, paused, error
-    last_sync = db.Column(db.DateTime)
-    next_sync = db.Column(db.DateTime)
-    
-    # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    # Relationships
-    logs = db.relationship('SyncLog', backref='sync', lazy=True, cascade='all, delete-orphan')
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'status': self.status,
-            'frequency': self.frequency,
-            'sync_direction': self.sync_direction,
-            'last_sync': self.last_sync.isoformat() if self.last_sync else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
-
-# models/log.py  
-class SyncLog(db.Model):
-    __tablename__ = 'sync_logs'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    sync_id = db.Column(db.Integer, db.ForeignKey('syncs.id'), nullable=False)
-    
-    # Log details
-    status = db.Column(db.String(50), nullable=False)  # started, completed, error
-    message = db.Column(db.Text)
-    rows_processed = db.Column(db.Integer, default=0)
-    errors = db.Column(db.JSON)
-    
-    # Performance metrics
-    duration_seconds = db.Column(db.Float)
-    
-    # Timestamp
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'status': self.status,
-            'message': self.message,
-            'rows_processed': self.rows_processed,
-            'duration_seconds': self.duration_seconds,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
@@ -0,0 +1,72 @@
+# scheduler/adaptive.py
+import logging
+from datetime import datetime, timedelta
+from models.log import SyncLog
+
+class AdaptiveIntervalPlanner:
+    """Chooses a sync's next run time from the change rate seen in its history.
+
+    The rate is estimated as changed rows per hour over recent completed
+    runs, and the interval is sized so that a run is expected to pick up
+    ``TARGET_CHANGES_PER_RUN`` changes. The result is clamped between the
+    plan's minimum interval and a multiple of the configured frequency.
+    """
+
+    HISTORY_RUNS = 20
+    TARGET_CHANGES_PER_RUN = 1.0
+    # How far past its configured frequency a quiet sync may be stretched
+    MAX_STRETCH = 48
+    MAX_INTERVAL = timedelta(weeks=1)
+
+    PLAN_MIN_INTERVALS = {
+        'free': timedelta(hours=1),
+        'starter': timedelta(minutes=15),
+        'pro': timedelta(minutes=5),
+        'business': timedelta(minutes=5)
+    }
+
+    def __init__(self, frequency_intervals: dict):
+        self.frequency_intervals = frequency_intervals
+        self.logger = logging.getLogger(__name__)
+
+    def changes_per_hour(self, sync):
+        """Observed change rate, or None when there is not enough history"""
+        logs = SyncLog.query.filter(SyncLog.sync_id == sync.id,
+                                    SyncLog.status == 'completed',
+                                    SyncLog.rows_changed.isnot(None))\
+                            .order_by(SyncLog.created_at.desc())\
+                            .limit(self.HISTORY_RUNS)\
+                            .all()
+        if len(logs) < 2:
+            return None
+
+        # The oldest run only marks the start of the window; its changes predate it
+        span_hours = (logs[0].created_at - logs[-1].created_at).total_seconds() / 3600
+        if span_hours <= 0:
+            return None
+
+        changes = sum(log.rows_changed for log in logs[:-1])
+        return changes / span_hours
+
+    def next_interval(self, sync) -> timedelta:
+        """Interval until the sync should run again"""
+        configured = self.frequency_intervals.get(sync.frequency, timedelta(hours=1))
+        lower = self.PLAN_MIN_INTERVALS.get(sync.user.plan_type, self.PLAN_MIN_INTERVALS['free'])
+        upper = max(lower, min(configured * self.MAX_STRETCH, self.MAX_INTERVAL))
+
+        rate = self.changes_per_hour(sync)
+        if rate is None:
+            return max(lower, configured)
+        if rate <= 0:
+            return upper
+
+        interval = timedelta(hours=self.TARGET_CHANGES_PER_RUN / rate)
+        return min(upper, max(lower, interval))
+
+    def plan_next_sync(self, sync, now: datetime = None) -> datetime:
+        """Set and return sync.next_sync based on the learned interval"""
+        now = now or datetime.utcnow()
+        interval = self.next_interval(sync)
+        sync.next_sync = now + interval
+        self.logger.info(f"Adaptive schedule for sync {sync.id}: next run in {interval}")
+        return sync.next_sync
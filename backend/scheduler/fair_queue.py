@@ -0,0 +1,118 @@
+# scheduler/fair_queue.py
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+class FairSyncQueue:
+    """Weighted fair queue of due syncs, tiered by plan.
+
+    Tiers share dispatch capacity by weight using stride scheduling charged
+    with each sync's expected duration, so a tier full of long syncs cannot
+    monopolise the worker. Within a tier the shortest expected job goes
+    first, with waiting time discounted from its cost so long jobs are not
+    starved; anything waiting longer than ``PROMOTE_AFTER`` is promoted one
+    tier per interval.
+    """
+
+    # Highest priority first
+    TIERS = ['business', 'pro', 'starter', 'free']
+    TIER_WEIGHTS = {'business': 8, 'pro': 4, 'starter': 2, 'free': 1}
+
+    # Seconds of expected duration forgiven per second spent waiting past due
+    AGING_RATE = 0.5
+    PROMOTE_AFTER = 1800
+    # Used when a sync has no completed runs to learn from
+    DEFAULT_DURATION = 60.0
+    LATENCY_SAMPLES = 500
+
+    def __init__(self):
+        self._entries = {}
+        self._passes = {tier: 0.0 for tier in self.TIERS}
+        self._latencies = {tier: deque(maxlen=self.LATENCY_SAMPLES) for tier in self.TIERS}
+        self._dispatched = {tier: 0 for tier in self.TIERS}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, sync_id: int, plan_type: str, due_at: float, expected_duration: float = None):
+        """Queue a due sync; re-pushing an already queued sync is a no-op"""
+        tier = plan_type if plan_type in self.TIER_WEIGHTS else 'free'
+        with self._lock:
+            if sync_id in self._entries:
+                return
+            self._entries[sync_id] = {
+                'sync_id': sync_id,
+                'tier': tier,
+                'due_at': due_at,
+                'expected_duration': expected_duration or self.DEFAULT_DURATION
+            }
+
+    def discard(self, sync_id: int):
+        with self._lock:
+            self._entries.pop(sync_id, None)
+
+    def pop(self, now: float = None) -> Optional[Dict]:
+        """Remove and return the next sync to dispatch, or None when empty"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self._entries:
+                return None
+
+            by_tier = {}
+            for entry in self._entries.values():
+                by_tier.setdefault(self._effective_tier(entry, now), []).append(entry)
+
+            # Stride scheduling: the active tier that has received least weighted service goes next.
+            # Tiers that were idle catch up to the others so they cannot bank credit.
+            floor = min(self._passes[tier] for tier in by_tier)
+            for tier in by_tier:
+                self._passes[tier] = max(self._passes[tier], floor)
+            tier = min(by_tier, key=lambda t: (self._passes[t], self.TIERS.index(t)))
+
+            entry = min(by_tier[tier], key=lambda e: self._job_cost(e, now))
+            del self._entries[entry['sync_id']]
+
+            self._passes[tier] += entry['expected_duration'] / self.TIER_WEIGHTS[tier]
+            return dict(entry, dispatch_tier=tier)
+
+    def mark_dispatched(self, entry: Dict, now: float = None):
+        """Record queue latency for a popped entry that actually started running"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._dispatched[entry['tier']] += 1
+            self._latencies[entry['tier']].append(max(0.0, now - entry['due_at']))
+
+    def get_metrics(self, now: float = None) -> Dict:
+        """Queue depth and due-to-dispatch latency per plan tier"""
+        now = time.time() if now is None else now
+        with self._lock:
+            metrics = {}
+            for tier in self.TIERS:
+                waiting = [now - e['due_at'] for e in self._entries.values() if e['tier'] == tier]
+                samples = sorted(self._latencies[tier])
+                metrics[tier] = {
+                    'depth': len(waiting),
+                    'oldest_wait_seconds': max(waiting) if waiting else 0.0,
+                    'dispatched': self._dispatched[tier],
+                    'latency_avg_seconds': sum(samples) / len(samples) if samples else 0.0,
+                    'latency_p50_seconds': self._percentile(samples, 0.50),
+                    'latency_p95_seconds': self._percentile(samples, 0.95),
+                    'latency_max_seconds': samples[-1] if samples else 0.0
+                }
+            return metrics
+
+    def _effective_tier(self, entry: Dict, now: float) -> str:
+        waited = max(0.0, now - entry['due_at'])
+        index = self.TIERS.index(entry['tier']) - int(waited // self.PROMOTE_AFTER)
+        return self.TIERS[max(0, index)]
+
+    def _job_cost(self, entry: Dict, now: float) -> float:
+        waited = max(0.0, now - entry['due_at'])
+        return entry['expected_duration'] - self.AGING_RATE * waited
+
+    def _percentile(self, samples: list, fraction: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
@@ -2,17 +2,69 @@
 import schedule
 import time
 import threading
-from datetime import datetime, timedelta
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from models.user import User  # noqa: F401 - registers the Sync.user relationship
 from models.sync import Sync
+from models.log import SyncLog
+from models.checkpoint import SyncCheckpoint
 from services.sync_engine import SyncEngine
 from services.notion_service import NotionService
 from services.sheets_service import SheetsService
+from services.cache import create_response_cache
+from services.quota import create_quota_manager
+from services.single_flight import SingleFlight
+from services.snapshot_store import SnapshotStore
+from services.checkpoints import CheckpointManager
+from services.transform_pool import TransformPool
+from scheduler.fair_queue import FairSyncQueue
+from scheduler.adaptive import AdaptiveIntervalPlanner
+from services.metrics import (
+    SCHEDULER_QUEUE_DEPTH, SCHEDULER_LAG, WORKER_BUSY_SECONDS, WORKER_UTILIZATION
+)
+from config import Config
+from extensions import db
 import logging
 
 class SyncScheduler:
-    def __init__(self):
+    FREQUENCY_INTERVALS = {
+        'realtime': timedelta(minutes=5),
+        'hourly': timedelta(hours=1),
+        'daily': timedelta(days=1),
+        'weekly': timedelta(weeks=1)
+    }
+    
+    # Failed syncs with an unfinished checkpoint are retried after
+    # RETRY_BACKOFF * 2**(attempts - 1), capped, for up to MAX_RETRY_ATTEMPTS runs
+    RETRY_BACKOFF = timedelta(minutes=5)
+    RETRY_BACKOFF_MAX = timedelta(hours=1)
+    MAX_RETRY_ATTEMPTS = 5
+    
+    # How often a long drain looks for syncs that became due since the tick started
+    REQUEUE_INTERVAL = 30
+
+    def __init__(self, app=None, quota=None):
+        self.app = app
         self.logger = logging.getLogger(__name__)
-        self.sync_engine = SyncEngine(NotionService(), SheetsService())
+        cache = create_response_cache(Config.CACHE_BACKEND, Config.REDIS_URL, Config.CACHE_DEFAULT_TTL)
+        body_cache = create_response_cache(Config.CACHE_BACKEND, Config.REDIS_URL,
+                                           max_entries=Config.BODY_CACHE_ENTRIES)
+        # Share the web app's manager when running in its process
+        self.quota = quota or create_quota_manager(Config.QUOTA_BACKEND, Config.REDIS_URL)
+        self.sync_engine = SyncEngine(
+            NotionService(cache, self.quota, SingleFlight(Config.FETCH_SHARE_WINDOW), body_cache=body_cache),
+            SheetsService(cache, self.quota, SingleFlight(Config.FETCH_SHARE_WINDOW)),
+            quota=self.quota,
+            snapshots=SnapshotStore(Config.SNAPSHOT_DIR),
+            profile_dir=Config.PROFILE_DIR,
+            transform_pool=TransformPool(Config.TRANSFORM_WORKERS, Config.TRANSFORM_MIN_ROWS)
+        )
+        self.queue = FairSyncQueue()
+        self.adaptive_planner = AdaptiveIntervalPlanner(self.FREQUENCY_INTERVALS)
+        self._last_tick = None
+        self._busy_seconds = 0.0
         self.running = False
 
     def start(self):
@@ -20,25 +72,34 @@ class SyncScheduler:
         self.running = True
         self.logger.info("Starting sync scheduler...")
         
-        # Schedule different frequencies
-        schedule.every(5).minutes.do(self._run_realtime_syncs)
-        schedule.every(1).hours.do(self._run_hourly_syncs)
-        schedule.every().day.at("02:00").do(self._run_daily_syncs)
-        schedule.every().week.do(self._run_weekly_syncs)
+        # Every tick queues whatever is due across all frequencies and dispatches it
+        # in fair order, rather than running each frequency's syncs in a fixed batch
+        schedule.every(1).minutes.do(self._run_due_syncs)
         
         # Run scheduler in background thread
         scheduler_thread = threading.Thread(target=self._scheduler_worker)
         scheduler_thread.daemon = True
         scheduler_thread.start()
 
+    def run_forever(self):
+        """Run the scheduler loop in the calling thread until stop() is called"""
+        self.running = True
+        self.logger.info("Starting sync scheduler in the foreground...")
+        schedule.every(1).minutes.do(self._run_due_syncs)
+        self._scheduler_worker()
+
     def stop(self):
         """Stop the scheduler"""
         self.running = False
         schedule.clear()
+        self.sync_engine.transform_pool.shutdown()
         self.logger.info("Sync scheduler stopped")
 
     def _scheduler_worker(self):
-        """Background worker that runs scheduled tasks"""
+        """Background worker that runs scheduled tasks; each tick opens its own app context"""
+        self._run_loop()
+
+    def _run_loop(self):
         while self.running:
             try:
                 schedule.run_pending()
@@ -47,65 +108,218 @@ class SyncScheduler:
                 self.logger.error(f"Scheduler error: {str(e)}")
                 time.sleep(60)  # Wait a minute before retrying
 
-    def _run_realtime_syncs(self):
-        """Run syncs that are set to real-time frequency"""
-        self._run_syncs_by_frequency('realtime')
-
-    def _run_hourly_syncs(self):
-        """Run syncs that are set to hourly frequency"""
-        self._run_syncs_by_frequency('hourly')
-
-    def _run_daily_syncs(self):
-        """Run syncs that are set to daily frequency"""
-        self._run_syncs_by_frequency('daily')
-
-    def _run_weekly_syncs(self):
-        """Run syncs that are set to weekly frequency"""
-        self._run_syncs_by_frequency('weekly')
-
-    def _run_syncs_by_frequency(self, frequency: str):
-        """Run all active syncs with the specified frequency"""
-        try:
-            syncs = Sync.query.filter_by(
-                frequency=frequency,
-                status='active'
-            ).all()
+    def get_queue_metrics(self) -> dict:
+        """Queue depth and latency per plan tier"""
+        return self.queue.get_metrics()
+
+    def _run_due_syncs(self):
+        """Queue every due sync and dispatch them in fair order.
+
+        Each tick gets a fresh app context and session, so a failed flush or
+        stale identity map never outlives the tick.
+        """
+        tick_started = time.monotonic()
+        with self.app.app_context() if self.app is not None else nullcontext():
+            try:
+                self._enqueue_due_syncs()
+                self._publish_queue_metrics()
+                self._drain_queue()
+                self.logger.info(f"Scheduler queue metrics: {self.queue.get_metrics()}")
+                
+            except Exception as e:
+                db.session.rollback()
+                self.logger.error(f"Error running due syncs: {str(e)}")
             
-            for sync in syncs:
-                # Check if enough time has passed since last sync
-                if self._should_run_sync(sync, frequency):
-                    try:
-                        self.logger.info(f"Running scheduled sync: {sync.name}")
-                        self.sync_engine.run_sync(sync)
-                    except Exception as e:
-                        self.logger.error(f"Failed to run sync {sync.id}: {str(e)}")
-                        
-        except Exception as e:
-            self.logger.error(f"Error running {frequency} syncs: {str(e)}")
+            finally:
+                db.session.remove()
+                self._publish_queue_metrics()
+                self._publish_utilization(tick_started)
+
+    def _publish_queue_metrics(self):
+        for tier, stats in self.queue.get_metrics().items():
+            SCHEDULER_QUEUE_DEPTH.set(stats['depth'], tier=tier)
+
+    def _publish_utilization(self, tick_started: float):
+        """Share of wall time since the previous tick spent running syncs"""
+        if self._last_tick is not None:
+            interval = time.monotonic() - self._last_tick
+            if interval > 0:
+                WORKER_UTILIZATION.set(min(1.0, self._busy_seconds / interval))
+        self._last_tick = tick_started
+        self._busy_seconds = 0.0
+
+    def _enqueue_due_syncs(self, skip=()):
+        """Push every due sync onto the fair queue, except those in ``skip``.
+        
+        Active syncs are due when their interval has elapsed; failed syncs are
+        due when their retry backoff has elapsed, so they resume their checkpoint.
+        """
+        syncs = Sync.query.options(joinedload(Sync.user)).filter(
+            Sync.status.in_(('active', 'error'))
+        ).all()
+        retry_at = self._retry_due_times([sync.id for sync in syncs if sync.status == 'error'])
+        
+        now = datetime.utcnow()
+        due = []
+        for sync in syncs:
+            if sync.id in skip:
+                continue
+            if sync.status == 'active':
+                if self._should_run_sync(sync, sync.frequency):
+                    due.append((sync, self._due_at(sync)))
+            elif sync.id in retry_at and retry_at[sync.id] <= now:
+                due.append((sync, retry_at[sync.id]))
+        
+        expected_durations = self._expected_durations([sync.id for sync, _ in due])
+        
+        for sync, due_at in due:
+            self.queue.push(
+                sync.id,
+                sync.user.plan_type,
+                due_at.replace(tzinfo=timezone.utc).timestamp(),
+                expected_durations.get(sync.id)
+            )
+
+    def _retry_due_times(self, sync_ids) -> dict:
+        """When each failed sync with a resumable checkpoint should be retried"""
+        if not sync_ids:
+            return {}
+        
+        checkpoints = SyncCheckpoint.query.filter(
+            SyncCheckpoint.sync_id.in_(sync_ids),
+            SyncCheckpoint.status == 'running',
+            SyncCheckpoint.updated_at >= datetime.utcnow() - CheckpointManager.MAX_AGE
+        ).all()
+        
+        retry_at = {}
+        for checkpoint in checkpoints:
+            attempts = checkpoint.attempts or 1
+            if attempts >= self.MAX_RETRY_ATTEMPTS:
+                continue
+            backoff = min(self.RETRY_BACKOFF * 2 ** (attempts - 1), self.RETRY_BACKOFF_MAX)
+            when = checkpoint.updated_at + backoff
+            if checkpoint.sync_id not in retry_at or when < retry_at[checkpoint.sync_id]:
+                retry_at[checkpoint.sync_id] = when
+        return retry_at
+
+    def _drain_queue(self):
+        """Run queued syncs until the queue is empty.
+        
+        Every ``REQUEUE_INTERVAL`` seconds the drain enqueues syncs that became
+        due meanwhile, so they compete for the next dispatch instead of waiting
+        for the drain to finish. A sync is dispatched or deferred at most once
+        per drain.
+        """
+        deferred = []
+        handled = set()
+        last_enqueue = time.monotonic()
+        
+        while True:
+            if time.monotonic() - last_enqueue >= self.REQUEUE_INTERVAL:
+                try:
+                    self._enqueue_due_syncs(skip=handled)
+                    self._publish_queue_metrics()
+                except Exception as e:
+                    db.session.rollback()
+                    self.logger.error(f"Failed to enqueue newly due syncs: {str(e)}")
+                last_enqueue = time.monotonic()
+            
+            entry = self.queue.pop()
+            if entry is None:
+                break
+            handled.add(entry['sync_id'])
+            
+            sync = Sync.query.get(entry['sync_id'])
+            # Failed syncs are only queued for a checkpoint retry; paused ones are skipped
+            if not sync or sync.status not in ('active', 'error'):
+                continue
+            
+            # Leave heavy tenants' syncs for a later tick instead of hitting 429s
+            if not self.quota.admit(sync.user_id, sync.user.plan_type):
+                self.logger.info(f"Deferring sync {sync.id}: user {sync.user_id} is over quota")
+                deferred.append(entry)
+                continue
+            
+            self.queue.mark_dispatched(entry)
+            SCHEDULER_LAG.observe(max(0.0, time.time() - entry['due_at']), tier=entry['tier'])
+            SCHEDULER_QUEUE_DEPTH.dec(tier=entry['tier'])
+            
+            run_started = time.monotonic()
+            try:
+                self.logger.info(f"Running scheduled sync: {sync.name} ({entry['dispatch_tier']} tier)")
+                self.sync_engine.run_sync(sync, profile=bool(sync.profiling_enabled))
+            except Exception as e:
+                # Leave the session usable for the syncs after this one
+                db.session.rollback()
+                self.logger.error(f"Failed to run sync {sync.id}: {str(e)}")
+            finally:
+                busy = time.monotonic() - run_started
+                self._busy_seconds += busy
+                WORKER_BUSY_SECONDS.inc(busy)
+            
+            if sync.adaptive_schedule:
+                try:
+                    self.adaptive_planner.plan_next_sync(sync)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    self.logger.error(f"Failed to plan next run for sync {sync.id}: {str(e)}")
+        
+        # Deferred syncs keep their original due time so they keep aging
+        for entry in deferred:
+            self.queue.push(entry['sync_id'], entry['tier'], entry['due_at'], entry['expected_duration'])
+
+    def _expected_durations(self, sync_ids: list) -> dict:
+        """Average recent run duration per sync, from completed sync logs"""
+        if not sync_ids:
+            return {}
+        
+        since = datetime.utcnow() - timedelta(days=30)
+        rows = db.session.query(SyncLog.sync_id, func.avg(SyncLog.duration_seconds))\
+                         .filter(SyncLog.sync_id.in_(sync_ids),
+                                 SyncLog.status == 'completed',
+                                 SyncLog.duration_seconds.isnot(None),
+                                 SyncLog.created_at >= since)\
+                         .group_by(SyncLog.sync_id)\
+                         .all()
+        
+        return {sync_id: float(avg) for sync_id, avg in rows if avg is not None}
+
+    def _due_at(self, sync) -> datetime:
+        """When the sync became (or becomes) due"""
+        if sync.adaptive_schedule and sync.next_sync:
+            return sync.next_sync
+        if not sync.last_sync:
+            return sync.created_at or datetime.utcnow()
+        
+        interval = self.FREQUENCY_INTERVALS.get(sync.frequency, timedelta(hours=1))
+        return sync.last_sync + interval
 
     def _should_run_sync(self, sync, frequency: str) -> bool:
         """Check if enough time has passed to run the sync again"""
         if not sync.last_sync:
             return True
+        
+        # Adaptive syncs run on the time the planner picked from their change rate
+        if sync.adaptive_schedule and sync.next_sync:
+            return datetime.utcnow() >= sync.next_sync
             
         now = datetime.utcnow()
         time_since_last = now - sync.last_sync
         
-        frequency_intervals = {
-            'realtime': timedelta(minutes=5),
-            'hourly': timedelta(hours=1),
-            'daily': timedelta(days=1),
-            'weekly': timedelta(weeks=1)
-        }
-        
-        required_interval = frequency_intervals.get(frequency, timedelta(hours=1))
+        required_interval = self.FREQUENCY_INTERVALS.get(frequency, timedelta(hours=1))
         return time_since_last >= required_interval
 
 # Initialize and start scheduler
-scheduler = SyncScheduler()
+scheduler = None
 
-def start_scheduler():
+def start_scheduler(app=None, quota=None):
+    global scheduler
+    if scheduler is None:
+        scheduler = SyncScheduler(app, quota)
     scheduler.start()
+    return scheduler
 
 def stop_scheduler():
-    scheduler.stop()
\ No newline at end of file
+    if scheduler is not None:
+        scheduler.stop()
\ No newline at end of file
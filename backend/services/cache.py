@@ -0,0 +1,184 @@
+# services/cache.py
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import redis
+except ImportError:  # Redis backend is optional
+    redis = None
+
+
+class LRUCacheBackend:
+    """Bounded in-process cache backend with least-recently-used eviction"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['retain_until'] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+
+class RedisCacheBackend:
+    """Shared cache backend storing JSON-encoded entries in Redis"""
+
+    def __init__(self, redis_url: str, namespace: str = 'bettersync:cache:'):
+        if redis is None:
+            raise RuntimeError('redis package is not installed')
+        self.client = redis.Redis.from_url(redis_url)
+        self.namespace = namespace
+
+    def get(self, key: str) -> Optional[Dict]:
+        raw = self.client.get(self.namespace + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: Dict):
+        retain_seconds = max(1, int(entry['retain_until'] - time.time()))
+        self.client.set(self.namespace + key, json.dumps(entry), ex=retain_seconds)
+
+    def delete(self, key: str):
+        self.client.delete(self.namespace + key)
+
+    def delete_prefix(self, prefix: str):
+        for key in self.client.scan_iter(match=f'{self.namespace}{prefix}*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """TTL cache for API responses with version-based revalidation.
+
+    Each entry carries an optional ``version`` (an ETag or a
+    ``last_edited_time``). Once an entry's TTL has passed it is kept around
+    as stale for ``stale_ttl`` seconds so that ``get_or_fetch`` can ask the
+    caller to revalidate it instead of blindly replacing it.
+    """
+
+    def __init__(self, backend=None, default_ttl: int = 300, stale_ttl: int = 86400):
+        self.backend = backend or LRUCacheBackend()
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a fresh cached value or None"""
+        entry = self._get_entry(key)
+        if entry and entry['expires_at'] >= time.time():
+            return entry['value']
+        return None
+
+    def set(self, key: str, value: Any, ttl: int = None, version: str = None):
+        """Store a value under key with its own TTL"""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        entry = {
+            'value': value,
+            'version': version,
+            'expires_at': now + ttl,
+            'retain_until': now + ttl + self.stale_ttl
+        }
+        try:
+            self.backend.set(key, entry)
+        except Exception as e:
+            self.logger.warning(f"Cache write failed for {key}: {str(e)}")
+
+    def invalidate(self, key: str):
+        """Drop a single cached entry"""
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            self.logger.warning(f"Cache invalidation failed for {key}: {str(e)}")
+
+    def invalidate_prefix(self, prefix: str):
+        """Drop every cached entry whose key starts with prefix"""
+        try:
+            self.backend.delete_prefix(prefix)
+        except Exception as e:
+            self.logger.warning(f"Cache invalidation failed for {prefix}*: {str(e)}")
+
+    def get_or_fetch(self, key: str, fetch: Callable, ttl: int = None) -> Any:
+        """Return the cached value for key, calling fetch when it is missing or stale.
+
+        ``fetch(stale_version)`` receives the version of the stale entry (or
+        None) and returns either ``(value, version)`` or ``NOT_MODIFIED`` when
+        the stale entry is still current, in which case its TTL is renewed.
+        A fetched value whose version matches the stale entry keeps the cached
+        object so downstream consumers see an unchanged value.
+        """
+        entry = self._get_entry(key)
+        if entry and entry['expires_at'] >= time.time():
+            return entry['value']
+
+        stale_version = entry['version'] if entry else None
+        result = fetch(stale_version)
+
+        if result is NOT_MODIFIED:
+            if entry is None:
+                raise ValueError(f'fetch returned NOT_MODIFIED without a cached entry for {key}')
+            value, version = entry['value'], entry['version']
+        else:
+            value, version = result
+            if entry and version is not None and version == stale_version:
+                value = entry['value']
+
+        self.set(key, value, ttl=ttl, version=version)
+        return value
+
+    def _get_entry(self, key: str) -> Optional[Dict]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            self.logger.warning(f"Cache read failed for {key}: {str(e)}")
+            return None
+
+
+# Sentinel returned by a revalidating fetch when the cached value is current
+NOT_MODIFIED = object()
+
+
+def token_fingerprint(access_token: str) -> str:
+    """Short stable hash of an access token for scoping cache keys per credential"""
+    return hashlib.sha256((access_token or '').encode()).hexdigest()[:16]
+
+
+def create_response_cache(backend: str = 'memory', redis_url: str = None,
+                          default_ttl: int = 300, max_entries: int = 1024) -> ResponseCache:
+    """Build a ResponseCache for the configured backend, falling back to memory"""
+    logger = logging.getLogger(__name__)
+
+    if backend == 'redis' and redis_url:
+        try:
+            return ResponseCache(RedisCacheBackend(redis_url), default_ttl=default_ttl)
+        except Exception as e:
+            logger.warning(f"Redis cache unavailable, using in-process cache: {str(e)}")
+
+    return ResponseCache(LRUCacheBackend(max_entries), default_ttl=default_ttl)
@@ -0,0 +1,128 @@
+# services/checkpoints.py
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from models.checkpoint import SyncCheckpoint
+from services.row_batch import RowBatch
+from extensions import db
+
+class CheckpointManager:
+    """Persists per-run progress so a failed sync resumes instead of restarting"""
+
+    # Checkpoints older than this are discarded; the source has likely moved on
+    MAX_AGE = timedelta(hours=24)
+    # Fetched source rows go stale much sooner than write progress; this covers
+    # the scheduler's first few retry backoffs, not a manual run hours later
+    FETCH_MAX_AGE = timedelta(hours=1)
+    # Saving accumulated rows after every page would rewrite the blob O(n^2) times
+    SAVE_EVERY_PAGES = 10
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def begin(self, sync, direction: str, resume_fetch: bool = True) -> SyncCheckpoint:
+        """Return the unfinished checkpoint for this sync/direction or start a new one.
+
+        Write progress is kept for up to ``MAX_AGE``. Read progress is only
+        kept when ``resume_fetch`` is set and the checkpoint was started
+        within ``FETCH_MAX_AGE``; otherwise the source is read again.
+        """
+        checkpoint = SyncCheckpoint.query.filter_by(
+            sync_id=sync.id,
+            direction=direction,
+            status='running'
+        ).order_by(SyncCheckpoint.updated_at.desc()).first()
+
+        if checkpoint and checkpoint.updated_at and \
+                datetime.utcnow() - checkpoint.updated_at <= self.MAX_AGE:
+            checkpoint.attempts = (checkpoint.attempts or 1) + 1
+            db.session.commit()
+            fetch_age = datetime.utcnow() - (checkpoint.created_at or checkpoint.updated_at)
+            if (checkpoint.notion_cursor or checkpoint.fetched_keys or checkpoint.fetch_completed) and \
+                    (not resume_fetch or fetch_age > self.FETCH_MAX_AGE):
+                self.logger.info(f"Discarding fetch progress of checkpoint {checkpoint.id}; rereading the source")
+                self.reset_fetch(checkpoint)
+            self.logger.info(
+                f"Resuming sync {sync.id} ({direction}) from checkpoint {checkpoint.id}, "
+                f"attempt {checkpoint.attempts}"
+            )
+            return checkpoint
+
+        if checkpoint:
+            # Too old to trust: retire it and start over
+            self._clear(checkpoint)
+
+        checkpoint = SyncCheckpoint(
+            sync_id=sync.id,
+            direction=direction,
+            status='running',
+            fetched_rows=[],
+            fetched_keys=[],
+            idempotency_keys=[]
+        )
+        db.session.add(checkpoint)
+        db.session.commit()
+        return checkpoint
+
+    def save_fetch_progress(self, checkpoint: SyncCheckpoint, page_number: int,
+                            next_cursor: str, rows: RowBatch, keys: list = None, force: bool = False):
+        """Record the pagination cursor and the rows (and their page ids) collected up to it"""
+        if not force and page_number % self.SAVE_EVERY_PAGES != 0:
+            return
+
+        checkpoint.notion_cursor = next_cursor
+        checkpoint.fetched_rows = rows.to_payload()
+        checkpoint.fetched_keys = list(keys or [])
+        db.session.commit()
+
+    def mark_fetch_completed(self, checkpoint: SyncCheckpoint, rows: RowBatch, keys: list = None):
+        checkpoint.notion_cursor = None
+        checkpoint.fetched_rows = rows.to_payload()
+        checkpoint.fetched_keys = list(keys or [])
+        checkpoint.fetch_completed = True
+        db.session.commit()
+
+    def fetched_rows(self, checkpoint: SyncCheckpoint) -> RowBatch:
+        """Rows collected by earlier attempts (older checkpoints hold plain dict rows)"""
+        return RowBatch.from_payload(checkpoint.fetched_rows)
+
+    def save_write_progress(self, checkpoint: SyncCheckpoint, batch_index: int, written_rows: list):
+        """Record a committed write batch and the idempotency keys it covered"""
+        keys = list(checkpoint.idempotency_keys or [])
+        keys.extend(self.idempotency_key(row) for row in written_rows)
+        checkpoint.idempotency_keys = keys
+        checkpoint.committed_batch = batch_index
+        db.session.commit()
+
+    def pending_rows(self, checkpoint: SyncCheckpoint, rows: list) -> list:
+        """Drop rows whose writes were already committed by an earlier attempt"""
+        committed = set(checkpoint.idempotency_keys or [])
+        if not committed:
+            return rows
+        return [row for row in rows if self.idempotency_key(row) not in committed]
+
+    def reset_fetch(self, checkpoint: SyncCheckpoint):
+        """Forget read progress, e.g. when the saved cursor is no longer accepted"""
+        checkpoint.notion_cursor = None
+        checkpoint.fetched_rows = []
+        checkpoint.fetched_keys = []
+        checkpoint.fetch_completed = False
+        db.session.commit()
+
+    def complete(self, checkpoint: SyncCheckpoint):
+        checkpoint.status = 'completed'
+        self._clear(checkpoint)
+
+    def idempotency_key(self, row: dict) -> str:
+        payload = json.dumps(row, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _clear(self, checkpoint: SyncCheckpoint):
+        if checkpoint.status == 'running':
+            checkpoint.status = 'expired'
+        checkpoint.notion_cursor = None
+        checkpoint.fetched_rows = None
+        checkpoint.fetched_keys = None
+        checkpoint.idempotency_keys = None
+        db.session.commit()
@@ -0,0 +1,241 @@
+# services/metrics.py
+import threading
+from typing import Dict, List, Tuple
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    """Base for in-process metrics rendered in the Prometheus text format"""
+
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames: List[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames or ())
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple, extra: Dict = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [f'{self.name}{self._format_labels(key)} {value}' for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        with self._lock:
+            return [f'{self.name}{self._format_labels(key)} {value}' for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+    def __init__(self, name, documentation, labelnames=None, buckets=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def _samples(self):
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": bound})} {cumulative}')
+                lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": "+Inf"})} {series["count"]}')
+                lines.append(f'{self.name}_sum{self._format_labels(key)} {series["sum"]}')
+                lines.append(f'{self.name}_count{self._format_labels(key)} {series["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric of this process"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=None, buckets=None) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Outbound API clients
+HTTP_CLIENT_LATENCY = REGISTRY.histogram(
+    'bettersync_http_client_request_duration_seconds',
+    'Latency of outbound Notion and Sheets API calls',
+    ['provider', 'endpoint', 'status'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+HTTP_CLIENT_RATE_LIMITED = REGISTRY.counter(
+    'bettersync_http_client_rate_limited_total',
+    'Outbound API calls rejected with HTTP 429',
+    ['provider', 'endpoint']
+)
+HTTP_CLIENT_RETRIES = REGISTRY.counter(
+    'bettersync_http_client_retries_total',
+    'Outbound API calls retried after a 429 or 5xx response',
+    ['provider', 'endpoint', 'status']
+)
+
+# Sync engine
+SYNC_DURATION = REGISTRY.histogram(
+    'bettersync_sync_duration_seconds',
+    'Duration of a sync direction',
+    ['direction', 'outcome']
+)
+SYNC_ROWS = REGISTRY.counter(
+    'bettersync_sync_rows_total',
+    'Rows synced',
+    ['direction']
+)
+SYNC_ROWS_PER_SECOND = REGISTRY.gauge(
+    'bettersync_sync_rows_per_second',
+    'Throughput of the most recent run in each direction',
+    ['direction']
+)
+SYNCS_IN_PROGRESS = REGISTRY.gauge(
+    'bettersync_syncs_in_progress',
+    'Sync runs currently executing in this process'
+)
+
+# Scheduler
+SCHEDULER_QUEUE_DEPTH = REGISTRY.gauge(
+    'bettersync_scheduler_queue_depth',
+    'Due syncs waiting to be dispatched',
+    ['tier']
+)
+SCHEDULER_LAG = REGISTRY.histogram(
+    'bettersync_scheduler_lag_seconds',
+    'Time between a sync becoming due and being dispatched',
+    ['tier']
+)
+WORKER_BUSY_SECONDS = REGISTRY.counter(
+    'bettersync_worker_busy_seconds_total',
+    'Time the scheduler worker spent running syncs'
+)
+WORKER_UTILIZATION = REGISTRY.gauge(
+    'bettersync_worker_utilization',
+    'Fraction of the last scheduler tick interval spent running syncs'
+)
+
+
+def observe_http_call(provider: str, endpoint: str, status, seconds: float):
+    """Record one outbound API call"""
+    HTTP_CLIENT_LATENCY.observe(seconds, provider=provider, endpoint=endpoint, status=status)
+    if str(status) == '429':
+        HTTP_CLIENT_RATE_LIMITED.inc(provider=provider, endpoint=endpoint)
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0'):
+    """Serve REGISTRY on ``/metrics`` from a daemon thread, for processes without the web app"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -1,15 +1,105 @@
 # services/notion_service.py
+import contextvars
+import json
+import time
 import requests
 import logging
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from services.cache import ResponseCache, LRUCacheBackend, NOT_MODIFIED, token_fingerprint
+from services.quota import QuotaManager
+from services.single_flight import SingleFlight
+from services.profiling import profile_phase, record_http_call, normalize_endpoint
+from services.metrics import observe_http_call, HTTP_CLIENT_RETRIES
+from services.transform_pool import flatten_property, title_text
 
 class NotionService:
-    def __init__(self):
+    SCHEMA_CACHE_TTL = 600
+    MAX_RETRIES = 3
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    # A 429 is rejected before any work; after a 5xx the page may already exist
+    CREATE_RETRY_STATUSES = (429,)
+    # Bodies are cached per last_edited_time, so the TTL only bounds how long stale entries linger
+    BODY_CACHE_TTL = 7 * 24 * 3600
+    BODY_CACHE_ENTRIES = 20000
+    BODY_FETCH_WORKERS = 4
+    BODY_MAX_DEPTH = 3
+    BODY_MAX_CHARS = 50000  # Google Sheets cell limit
+
+    def __init__(self, cache: ResponseCache = None, quota: QuotaManager = None,
+                 single_flight: SingleFlight = None, body_cache: ResponseCache = None):
         self.base_url = 'https://api.notion.com/v1'
+        self.cache = cache or ResponseCache()
+        # Page bodies get their own store so they neither evict nor get evicted by API responses
+        self.body_cache = body_cache or ResponseCache(LRUCacheBackend(self.BODY_CACHE_ENTRIES))
+        self.quota = quota or QuotaManager()
+        self.single_flight = single_flight or SingleFlight()
         self.logger = logging.getLogger(__name__)
 
-    def get_database_rows(self, database_id: str, access_token: str, filters: Dict = None) -> List[Dict]:
-        """Fetch all rows from a Notion database"""
+    def get_database_rows(self, database_id: str, access_token: str, filters: Dict = None,
+                          start_cursor: str = None, on_page: Callable = None,
+                          reuse_recent: bool = True) -> List[Dict]:
+        """Fetch all rows from a Notion database.
+
+        Pass ``start_cursor`` to resume pagination mid-way; ``on_page`` is
+        called as ``on_page(page_number, page_results, next_cursor)`` for
+        each page so callers can checkpoint their progress.
+        
+        Full fetches are shared between syncs reading the same database with
+        the same filters. Only the API pages are shared: the caller that
+        fetches gets ``on_page`` as each page arrives, so its checkpoints
+        keep up with the fetch, while callers that joined replay the pages
+        through their own ``on_page`` once it is done. A failing callback
+        only fails its own caller. ``reuse_recent=False`` skips results that
+        finished within the share window. The returned list is shared and
+        must not be mutated.
+        """
+        if start_cursor:
+            return self._query_database(database_id, access_token, filters, start_cursor, on_page)
+        
+        filters_key = json.dumps(filters or {}, sort_keys=True, default=str)
+        key = f'notion:rows:{database_id}:{token_fingerprint(access_token)}:{filters_key}'
+        callback_errors = []
+        pages, shared = self.single_flight.do(
+            key,
+            lambda: self._fetch_database_pages(database_id, access_token, filters, on_page, callback_errors),
+            reuse_finished=reuse_recent
+        )
+        if callback_errors:
+            raise callback_errors[0]
+        
+        results = []
+        for page_number, (page_results, next_cursor) in enumerate(pages, start=1):
+            results.extend(page_results)
+            if on_page and shared:
+                on_page(page_number, page_results, next_cursor)
+        return results
+
+    def _fetch_database_pages(self, database_id: str, access_token: str, filters: Dict = None,
+                              on_page: Callable = None, callback_errors: List = None) -> List[Tuple]:
+        """Full database query as ``(page_results, next_cursor)`` per API page.
+
+        ``on_page`` is called as pages arrive. Its first error is appended to
+        ``callback_errors`` and stops further calls, but not the fetch, whose
+        pages other callers may be waiting for.
+        """
+        pages = []
+        callback_errors = [] if callback_errors is None else callback_errors
+        
+        def collect(page_number, page_results, next_cursor):
+            pages.append((page_results, next_cursor))
+            if on_page and not callback_errors:
+                try:
+                    on_page(page_number, page_results, next_cursor)
+                except Exception as e:
+                    callback_errors.append(e)
+        
+        self._query_database(database_id, access_token, filters, on_page=collect)
+        return pages
+
+    def _query_database(self, database_id: str, access_token: str, filters: Dict = None,
+                        start_cursor: str = None, on_page: Callable = None) -> List[Dict]:
+        """Page through a database query"""
         try:
             headers = {
                 'Authorization': f'Bearer {access_token}',
@@ -22,20 +112,30 @@ class NotionService:
             payload = {}
             if filters:
                 payload['filter'] = self._build_notion_filter(filters)
+            if start_cursor:
+                payload['start_cursor'] = start_cursor
             
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            results = data.get('results', [])
+            results = []
+            page_number = 0
             
             # Handle pagination
-            while data.get('has_more', False):
-                payload['start_cursor'] = data.get('next_cursor')
-                response = requests.post(url, json=payload, headers=headers)
+            while True:
+                response = self._request('post', url, json=payload, headers=headers)
                 response.raise_for_status()
-                data = response.json()
-                results.extend(data.get('results', []))
+                with profile_phase('json_decode'):
+                    data = response.json()
+                
+                page_results = data.get('results', [])
+                results.extend(page_results)
+                page_number += 1
+                
+                next_cursor = data.get('next_cursor') if data.get('has_more', False) else None
+                if on_page:
+                    on_page(page_number, page_results, next_cursor)
+                
+                if not next_cursor:
+                    break
+                payload['start_cursor'] = next_cursor
             
             return results
             
@@ -43,6 +143,32 @@ class NotionService:
             self.logger.error(f"Failed to fetch Notion database rows: {str(e)}")
             raise
 
+    def query_database_page(self, database_id: str, access_token: str, filters: Dict = None,
+                            page_size: int = 100) -> Tuple[List[Dict], bool]:
+        """Fetch only the first page of a database query; returns (rows, has_more)"""
+        try:
+            headers = {
+                'Authorization': f'Bearer {access_token}',
+                'Content-Type': 'application/json',
+                'Notion-Version': '2022-06-28'
+            }
+            
+            url = f'{self.base_url}/databases/{database_id}/query'
+            
+            payload = {'page_size': max(1, min(page_size, 100))}
+            if filters:
+                payload['filter'] = self._build_notion_filter(filters)
+            
+            response = self._request('post', url, json=payload, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            
+            return data.get('results', []), data.get('has_more', False)
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to query Notion database page: {str(e)}")
+            raise
+
     def get_page(self, page_id: str, access_token: str) -> Optional[Dict]:
         """Fetch a specific Notion page"""
         try:
@@ -53,7 +179,7 @@ class NotionService:
             }
             
             url = f'{self.base_url}/pages/{page_id}'
-            response = requests.get(url, headers=headers)
+            response = self._request('get', url, headers=headers)
             response.raise_for_status()
             
             return response.json()
@@ -62,31 +188,277 @@ class NotionService:
             self.logger.error(f"Failed to fetch Notion page {page_id}: {str(e)}")
             return None
 
-    def update_database_rows(self, database_id: str, data: List[Dict], access_token: str):
-        """Update or create rows in Notion database"""
-        try:
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json',
-                'Notion-Version': '2022-06-28'
+    def get_page_bodies(self, pages: List[Dict], access_token: str) -> Dict[str, str]:
+        """Plain-text body of each page, keyed by page id.
+
+        Block children are fetched for several pages at once, each request
+        still going through the Notion rate limit. Bodies are kept in
+        ``body_cache`` by page id and ``last_edited_time``, so unchanged pages
+        are not refetched while the store has room for them.
+        Pages whose body cannot be fetched map to an empty string.
+        """
+        fingerprint = token_fingerprint(access_token)
+        bodies = {}
+        missing = {}
+        
+        for page in pages:
+            page_id = page.get('id')
+            if not page_id or page_id in bodies or page_id in missing:
+                continue
+            edited = page.get('last_edited_time')
+            key = f'notion:body:{page_id}:{edited}:{fingerprint}' if edited else None
+            cached = self.body_cache.get(key) if key else None
+            if cached is not None:
+                bodies[page_id] = cached
+            else:
+                missing[page_id] = key
+        
+        if not missing:
+            return bodies
+        
+        with ThreadPoolExecutor(max_workers=min(self.BODY_FETCH_WORKERS, len(missing))) as executor:
+            # Each task runs in a copy of this context so quota tenant and profiler carry over
+            futures = {
+                executor.submit(contextvars.copy_context().run, self._fetch_page_body, page_id, access_token): page_id
+                for page_id in missing
             }
+            for future in as_completed(futures):
+                page_id = futures[future]
+                try:
+                    bodies[page_id] = future.result()
+                except requests.exceptions.RequestException as e:
+                    self.logger.warning(f"Failed to fetch body of Notion page {page_id}: {str(e)}")
+                    bodies[page_id] = ''
+                    continue
+                if missing[page_id]:
+                    self.body_cache.set(missing[page_id], bodies[page_id], ttl=self.BODY_CACHE_TTL)
+        
+        return bodies
+
+    def get_block_children(self, block_id: str, access_token: str) -> List[Dict]:
+        """Fetch every child block of a page or block"""
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json',
+            'Notion-Version': '2022-06-28'
+        }
+        
+        url = f'{self.base_url}/blocks/{block_id}/children'
+        params = {'page_size': 100}
+        blocks = []
+        
+        while True:
+            response = self._request('get', url, headers=headers, params=params)
+            response.raise_for_status()
+            data = response.json()
             
-            for row in data:
-                # Check if row exists (by unique identifier)
-                existing_page = self._find_existing_page(database_id, row, access_token)
+            blocks.extend(data.get('results', []))
+            if not data.get('has_more') or not data.get('next_cursor'):
+                break
+            params['start_cursor'] = data['next_cursor']
+        
+        return blocks
+
+    def _fetch_page_body(self, page_id: str, access_token: str) -> str:
+        text = '\n'.join(self._block_text_lines(page_id, access_token, 0))
+        return text[:self.BODY_MAX_CHARS]
+
+    def _block_text_lines(self, block_id: str, access_token: str, depth: int) -> List[str]:
+        """Flatten a block's children to lines of text, indenting nested blocks"""
+        lines = []
+        for block in self.get_block_children(block_id, access_token):
+            text = self._block_text(block)
+            if text:
+                lines.append('  ' * depth + text)
+            
+            # Sub-pages and databases are separate documents, not part of this body
+            if block.get('has_children') and depth + 1 < self.BODY_MAX_DEPTH and \
+                    block.get('type') not in ('child_page', 'child_database'):
+                lines.extend(self._block_text_lines(block['id'], access_token, depth + 1))
+        return lines
+
+    def _block_text(self, block: Dict) -> str:
+        """Plain text of a single block"""
+        block_type = block.get('type')
+        content = block.get(block_type) or {}
+        
+        if block_type == 'child_page':
+            return content.get('title', '')
+        
+        text = ''.join(rt.get('plain_text', '') for rt in content.get('rich_text', []))
+        if block_type == 'bulleted_list_item':
+            return f'- {text}'
+        elif block_type == 'numbered_list_item':
+            return f'1. {text}'
+        elif block_type == 'to_do':
+            return f"[{'x' if content.get('checked') else ' '}] {text}"
+        return text
+
+    def update_database_rows(self, database_id: str, data: List[Dict], access_token: str,
+                             batch_size: int = 50, on_batch: Callable = None) -> Dict[str, str]:
+        """Update or create rows in Notion database.
+
+        Rows are matched to existing pages by the database's title property
+        and updated, or created when no page has that title. Pages whose
+        values already match the row are not written, so their
+        ``last_edited_time`` only moves on real edits. Rows are written
+        in batches of ``batch_size``; ``on_batch`` is called as
+        ``on_batch(batch_index, batch_rows)`` once every row in a batch is written.
+        Returns the title -> page id map used for matching, pages created here included.
+        """
+        if not data:
+            return {}
+        
+        try:
+            title_property = self._title_property(database_id, access_token)
+            # One paginated query instead of a lookup per row
+            pages_by_title = self._index_pages_by_title(database_id, title_property, access_token)
+            
+            for batch_index, start in enumerate(range(0, len(data), batch_size)):
+                batch = data[start:start + batch_size]
                 
-                if existing_page:
-                    # Update existing page
-                    self._update_page(existing_page['id'], row, access_token)
-                else:
-                    # Create new page
-                    self._create_page(database_id, row, access_token)
+                for row in batch:
+                    # Check if row exists (by unique identifier)
+                    existing_page = self._find_existing_page(row, title_property, pages_by_title)
+                    
+                    if existing_page:
+                        # Update existing page
+                        if self._page_differs(existing_page, row):
+                            self._update_page(existing_page['id'], row, access_token, title_property)
+                    else:
+                        # Create new page
+                        page = self._create_page(database_id, row, access_token, title_property)
+                        # Later rows with the same title update this page instead of duplicating it
+                        title = row.get(title_property) if title_property else None
+                        if title not in (None, '') and page.get('id'):
+                            pages_by_title.setdefault(str(title), page)
+                
+                if on_batch:
+                    on_batch(batch_index, batch)
+            
+            # Rows fetched before these writes are no longer current
+            self.single_flight.forget(f'notion:rows:{database_id}:')
+            return {title: page['id'] for title, page in pages_by_title.items()}
                     
         except Exception as e:
             self.logger.error(f"Failed to update Notion database: {str(e)}")
             raise
 
-    def _create_page(self, database_id: str, row_data: Dict, access_token: str):
+    def archive_pages(self, database_id: str, page_ids: List[str], access_token: str,
+                      batch_size: int = 50, on_batch: Callable = None) -> int:
+        """Archive pages in batches; returns how many were archived.
+
+        Every request goes through the Notion rate limit. ``on_batch`` is
+        called as ``on_batch(batch_index, batch_page_ids)`` after each batch.
+        Pages that are already gone are skipped.
+        """
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json',
+            'Notion-Version': '2022-06-28'
+        }
+        archived = 0
+        
+        try:
+            for batch_index, start in enumerate(range(0, len(page_ids), batch_size)):
+                batch = page_ids[start:start + batch_size]
+                
+                for page_id in batch:
+                    response = self._request(
+                        'patch', f'{self.base_url}/pages/{page_id}', json={'archived': True}, headers=headers
+                    )
+                    if response.status_code == 404:
+                        continue
+                    response.raise_for_status()
+                    archived += 1
+                
+                if on_batch:
+                    on_batch(batch_index, batch)
+            
+            return archived
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to archive Notion pages: {str(e)}")
+            raise
+        
+        finally:
+            if archived:
+                self.single_flight.forget(f'notion:rows:{database_id}:')
+
+    def _request(self, method: str, url: str, retry_statuses: Tuple[int, ...] = None,
+                 **kwargs) -> requests.Response:
+        """Issue a Notion API request once quota is available, retrying 429s and 5xx.
+
+        Non-idempotent calls pass a narrower ``retry_statuses``.
+        """
+        endpoint = normalize_endpoint(url)
+        retry_statuses = self.RETRY_STATUSES if retry_statuses is None else retry_statuses
+        
+        for attempt in range(self.MAX_RETRIES + 1):
+            self.quota.acquire('notion')
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                response = requests.request(method, url, **kwargs)
+                status = response.status_code
+            finally:
+                elapsed = time.perf_counter() - started
+                record_http_call('notion', method, url, status, elapsed)
+                observe_http_call('notion', f'{method.upper()} {endpoint}', status, elapsed)
+            
+            if status not in retry_statuses or attempt == self.MAX_RETRIES:
+                return response
+            
+            HTTP_CLIENT_RETRIES.inc(provider='notion', endpoint=f'{method.upper()} {endpoint}', status=status)
+            retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+            self.logger.warning(f"Notion returned {status} for {endpoint}, retrying in {delay}s")
+            time.sleep(min(delay, 30))
+
+    def _title_property(self, database_id: str, access_token: str) -> Optional[str]:
+        """Name of the database's title property"""
+        schema = self.get_database_schema(database_id, access_token)
+        for name, prop in (schema or {}).get('properties', {}).items():
+            if prop.get('type') == 'title':
+                return name
+        return None
+
+    def _index_pages_by_title(self, database_id: str, title_property: Optional[str],
+                              access_token: str) -> Dict[str, Dict]:
+        """Map each page title in the database to its page (first page wins)"""
+        if not title_property:
+            return {}
+        
+        index = {}
+        for page in self._query_database(database_id, access_token):
+            text = title_text(page.get('properties', {}).get(title_property) or {})
+            if text:
+                index.setdefault(text, page)
+        return index
+
+    def _find_existing_page(self, row: Dict, title_property: Optional[str],
+                            pages_by_title: Dict[str, Dict]) -> Optional[Dict]:
+        """The page whose title matches the row's title value, if any"""
+        title = row.get(title_property) if title_property else None
+        if title in (None, ''):
+            return None
+        return pages_by_title.get(str(title))
+
+    def _page_differs(self, page: Dict, row: Dict) -> bool:
+        """Whether writing the row would change any of the page's values"""
+        properties = page.get('properties') or {}
+        for field_name, value in row.items():
+            prop = properties.get(field_name)
+            # Unknown or relation properties can't be compared; write them
+            if prop is None or prop.get('type') == 'relation':
+                return True
+            current = flatten_property(prop)
+            if ('' if current is None else str(current)) != ('' if value is None else str(value)):
+                return True
+        return False
+
+    def _create_page(self, database_id: str, row_data: Dict, access_token: str,
+                     title_property: str = None) -> Dict:
         """Create a new page in Notion database"""
         headers = {
             'Authorization': f'Bearer {access_token}',
@@ -98,13 +470,16 @@ class NotionService:
         
         payload = {
             'parent': {'database_id': database_id},
-            'properties': self._format_properties_for_notion(row_data)
+            'properties': self._format_properties_for_notion(row_data, title_property)
         }
         
-        response = requests.post(url, json=payload, headers=headers)
+        # Retrying a 5xx could create the page twice
+        response = self._request('post', url, json=payload, headers=headers,
+                                 retry_statuses=self.CREATE_RETRY_STATUSES)
         response.raise_for_status()
+        return response.json()
 
-    def _update_page(self, page_id: str, row_data: Dict, access_token: str):
+    def _update_page(self, page_id: str, row_data: Dict, access_token: str, title_property: str = None):
         """Update an existing Notion page"""
         headers = {
             'Authorization': f'Bearer {access_token}',
@@ -115,18 +490,22 @@ class NotionService:
         url = f'{self.base_url}/pages/{page_id}'
         
         payload = {
-            'properties': self._format_properties_for_notion(row_data)
+            'properties': self._format_properties_for_notion(row_data, title_property)
         }
         
-        response = requests.patch(url, json=payload, headers=headers)
+        response = self._request('patch', url, json=payload, headers=headers)
         response.raise_for_status()
 
-    def _format_properties_for_notion(self, row_data: Dict) -> Dict:
+    def _format_properties_for_notion(self, row_data: Dict, title_property: str = None) -> Dict:
         """Format row data for Notion API"""
         properties = {}
         
         for field_name, value in row_data.items():
-            if isinstance(value, str):
+            if field_name == title_property:
+                properties[field_name] = {
+                    'title': [{'text': {'content': str(value)}}]
+                }
+            elif isinstance(value, str):
                 properties[field_name] = {
                     'rich_text': [{'text': {'content': value}}]
                 }
@@ -157,20 +536,45 @@ class NotionService:
             return {'and': notion_filters}
 
     def get_database_schema(self, database_id: str, access_token: str) -> Dict:
-        """Get database schema for field mapping"""
+        """Get database schema for field mapping, served from cache when fresh"""
         try:
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json',
-                'Notion-Version': '2022-06-28'
-            }
-            
-            url = f'{self.base_url}/databases/{database_id}'
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            return response.json()
+            return self.cache.get_or_fetch(
+                self._schema_cache_key(database_id, access_token),
+                lambda stale_version: self._fetch_database_schema(database_id, access_token, stale_version),
+                ttl=self.SCHEMA_CACHE_TTL
+            )
             
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Failed to fetch database schema: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def invalidate_database_schema(self, database_id: str):
+        """Drop cached schemas for a database (all tokens)"""
+        self.cache.invalidate_prefix(f'notion:schema:{database_id}:')
+
+    def _fetch_database_schema(self, database_id: str, access_token: str, stale_version: str = None):
+        """Fetch database schema, revalidating a stale cached copy when possible"""
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json',
+            'Notion-Version': '2022-06-28'
+        }
+        
+        # Stale versions that came from an ETag can be revalidated with a conditional GET
+        if stale_version and stale_version.startswith('etag:'):
+            headers['If-None-Match'] = stale_version[len('etag:'):]
+        
+        url = f'{self.base_url}/databases/{database_id}'
+        response = self._request('get', url, headers=headers)
+        if response.status_code == 304:
+            return NOT_MODIFIED
+        response.raise_for_status()
+        
+        schema = response.json()
+        etag = response.headers.get('ETag')
+        version = f'etag:{etag}' if etag else schema.get('last_edited_time')
+        return schema, version
+
+    def _schema_cache_key(self, database_id: str, access_token: str) -> str:
+        # Scope entries to the token so one user's schema is never served to another
+        return f'notion:schema:{database_id}:{token_fingerprint(access_token)}'
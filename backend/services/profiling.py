@@ -0,0 +1,148 @@
+# services/profiling.py
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Profiler for the sync run executing on this thread/task, if one was requested
+_current_profiler = contextvars.ContextVar('run_profiler', default=None)
+
+_ID_PATTERN = re.compile(r'/[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}')
+
+
+class RunProfiler:
+    """Profiles a single sync run.
+
+    Combines a cProfile capture of the whole run with wall-clock time per
+    engine phase (exclusive of nested phases) and per outbound HTTP call.
+    """
+
+    TOP_FUNCTIONS = 25
+
+    def __init__(self, use_cprofile: bool = True):
+        self.use_cprofile = use_cprofile
+        self.profile = None
+        self.started = None
+        self.wall_seconds = None
+        self.phases = defaultdict(lambda: {'calls': 0, 'total_seconds': 0.0, 'self_seconds': 0.0})
+        self.http = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'statuses': defaultdict(int)})
+        self._stack = []
+        self._token = None
+        self.logger = logging.getLogger(__name__)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._token = _current_profiler.set(self)
+        if self.use_cprofile:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Another profiler already owns this thread; keep phase and HTTP timings only
+                self.logger.warning("cProfile unavailable for this run, recording timings only")
+                self.profile = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile:
+            self.profile.disable()
+        self.wall_seconds = time.perf_counter() - self.started
+        _current_profiler.reset(self._token)
+        return False
+
+    @contextmanager
+    def phase(self, name: str):
+        frame = {'started': time.perf_counter(), 'children': 0.0}
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame['started']
+            stats = self.phases[name]
+            stats['calls'] += 1
+            stats['total_seconds'] += elapsed
+            stats['self_seconds'] += elapsed - frame['children']
+            if self._stack:
+                self._stack[-1]['children'] += elapsed
+
+    def record_http(self, provider: str, method: str, endpoint: str, status, seconds: float):
+        stats = self.http[f'{provider} {method.upper()} {endpoint}']
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['statuses'][str(status)] += 1
+
+    def summary(self) -> Dict:
+        """JSON-serialisable breakdown of where the run spent its time"""
+        http_seconds = sum(stats['seconds'] for stats in self.http.values())
+        return {
+            'wall_seconds': self.wall_seconds,
+            'http_seconds': http_seconds,
+            'phases': {name: dict(stats) for name, stats in self.phases.items()},
+            'http': {
+                key: {'calls': stats['calls'], 'seconds': stats['seconds'], 'statuses': dict(stats['statuses'])}
+                for key, stats in sorted(self.http.items(), key=lambda item: -item[1]['seconds'])
+            },
+            'top_functions': self._top_functions()
+        }
+
+    def save(self, directory: str, name: str) -> str:
+        """Write ``<name>.prof`` (pstats) and ``<name>.json`` (summary); returns the summary path"""
+        os.makedirs(directory, exist_ok=True)
+        if self.profile:
+            self.profile.dump_stats(os.path.join(directory, f'{name}.prof'))
+        summary_path = os.path.join(directory, f'{name}.json')
+        with open(summary_path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        return summary_path
+
+    def _top_functions(self):
+        if not self.profile:
+            return []
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = []
+        for (filename, line, function), (_, calls, self_time, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f'{os.path.basename(filename)}:{line}({function})',
+                'calls': calls,
+                'self_seconds': self_time,
+                'cumulative_seconds': cumulative
+            })
+        rows.sort(key=lambda row: -row['cumulative_seconds'])
+        return rows[:self.TOP_FUNCTIONS]
+
+
+def current_profiler() -> Optional[RunProfiler]:
+    return _current_profiler.get()
+
+
+@contextmanager
+def profile_phase(name: str):
+    """Attribute the enclosed time to an engine phase when the run is being profiled"""
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.phase(name):
+        yield
+
+
+def record_http_call(provider: str, method: str, url: str, status, seconds: float):
+    """Record an outbound API call against the active profiler, if any"""
+    profiler = _current_profiler.get()
+    if profiler is not None:
+        profiler.record_http(provider, method, normalize_endpoint(url), status, seconds)
+
+
+def normalize_endpoint(url: str) -> str:
+    """Strip host and object ids so calls group by endpoint"""
+    path = re.sub(r'^https?://[^/]+', '', url or '').split('?')[0]
+    return _ID_PATTERN.sub('/{id}', path)
@@ -0,0 +1,227 @@
+# services/quota.py
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import redis
+except ImportError:  # Redis store is optional
+    redis = None
+
+# Tenant whose sync is currently issuing API calls on this thread/task
+_current_tenant = contextvars.ContextVar('quota_tenant', default=None)
+
+
+class InMemoryQuotaStore:
+    """Rolling-window request counters kept in this process"""
+
+    shared = False
+
+    def __init__(self):
+        self._events = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def usage(self, scope: str, window: int, now: float) -> int:
+        with self._lock:
+            events = self._events[scope]
+            self._trim(events, now - window)
+            return len(events)
+
+    def try_consume(self, limits: Dict[str, int], window: int, now: float, cost: int) -> bool:
+        """Record cost against every scope if all of them have room"""
+        with self._lock:
+            for scope, limit in limits.items():
+                events = self._events[scope]
+                self._trim(events, now - window)
+                if len(events) + cost > limit:
+                    return False
+            for scope in limits:
+                self._events[scope].extend([now] * cost)
+            return True
+
+    def _trim(self, events: deque, cutoff: float):
+        while events and events[0] <= cutoff:
+            events.popleft()
+
+
+class RedisQuotaStore:
+    """Rolling-window request counters shared across processes via Redis sorted sets"""
+
+    shared = True
+
+    def __init__(self, redis_url: str, namespace: str = 'bettersync:quota:'):
+        if redis is None:
+            raise RuntimeError('redis package is not installed')
+        self.client = redis.Redis.from_url(redis_url)
+        self.namespace = namespace
+
+    def usage(self, scope: str, window: int, now: float) -> int:
+        key = self.namespace + scope
+        self.client.zremrangebyscore(key, 0, now - window)
+        return self.client.zcard(key)
+
+    def try_consume(self, limits: Dict[str, int], window: int, now: float, cost: int) -> bool:
+        # Check-then-add is not atomic across workers; a small overshoot is acceptable
+        for scope, limit in limits.items():
+            if self.usage(scope, window, now) + cost > limit:
+                return False
+        pipe = self.client.pipeline()
+        for scope in limits:
+            key = self.namespace + scope
+            pipe.zadd(key, {f'{now}:{uuid.uuid4().hex}': now for _ in range(cost)})
+            pipe.expire(key, window * 2)
+        pipe.execute()
+        return True
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request could not get quota within the allowed wait"""
+
+
+class QuotaManager:
+    """Tracks API request budgets per user, per plan and per provider.
+
+    Budgets are requests per rolling ``window`` seconds. Provider budgets
+    mirror the upstream limits (Notion per integration, Sheets per project);
+    plan budgets cap how much of them a single tenant can take.
+
+    Budgets and usage are only as wide as the store: with the in-process
+    store, the web app and each worker count and enforce their own calls.
+    """
+
+    WINDOW_SECONDS = 60
+
+    PROVIDER_BUDGETS = {
+        'notion': 180,  # ~3 requests/second per integration
+        'sheets': 300   # read/write requests per minute per project
+    }
+
+    PLAN_BUDGETS = {
+        'free': {'notion': 20, 'sheets': 30},
+        'starter': {'notion': 40, 'sheets': 60},
+        'pro': {'notion': 80, 'sheets': 120},
+        'business': {'notion': 120, 'sheets': 200}
+    }
+
+    # Fraction of the plan budget that must be free before a new sync is admitted
+    ADMISSION_HEADROOM = 0.25
+
+    def __init__(self, store=None, max_wait: float = 120.0):
+        self.store = store or InMemoryQuotaStore()
+        self.max_wait = max_wait
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def shared(self) -> bool:
+        """Whether usage is counted across processes rather than in this one"""
+        return getattr(self.store, 'shared', False)
+
+    @contextmanager
+    def tenant(self, user_id, plan_type: str):
+        """Attribute API calls made inside this block to a user"""
+        token = _current_tenant.set((user_id, plan_type or 'free'))
+        try:
+            yield
+        finally:
+            _current_tenant.reset(token)
+
+    def acquire(self, provider: str, cost: int = 1):
+        """Block until the current tenant and provider have budget, then consume it"""
+        limits = self._limits_for(provider, _current_tenant.get())
+        deadline = time.monotonic() + self.max_wait
+        delay = 0.05
+
+        while True:
+            if self.store.try_consume(limits, self.WINDOW_SECONDS, time.time(), cost):
+                return
+            if time.monotonic() >= deadline:
+                raise QuotaExceeded(f'{provider} quota exhausted for {", ".join(limits)}')
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+
+    def admit(self, user_id, plan_type: str) -> bool:
+        """Whether a new sync for this user should start now"""
+        plan_budget = self.PLAN_BUDGETS.get(plan_type or 'free', self.PLAN_BUDGETS['free'])
+        now = time.time()
+
+        for provider, limit in plan_budget.items():
+            used = self.store.usage(self._user_scope(provider, user_id), self.WINDOW_SECONDS, now)
+            if limit - used < limit * self.ADMISSION_HEADROOM:
+                return False
+
+            provider_used = self.store.usage(self._provider_scope(provider), self.WINDOW_SECONDS, now)
+            if provider_used >= self.PROVIDER_BUDGETS[provider]:
+                return False
+
+        return True
+
+    def get_usage(self, user_id, plan_type: str) -> Dict:
+        """Current usage and limits for a user.
+
+        ``scope`` is ``process`` when the store is in-process: ``used`` then
+        counts only calls made by this process, not by scheduler workers.
+        """
+        plan_budget = self.PLAN_BUDGETS.get(plan_type or 'free', self.PLAN_BUDGETS['free'])
+        now = time.time()
+
+        return {
+            'window_seconds': self.WINDOW_SECONDS,
+            'plan_type': plan_type,
+            'scope': 'shared' if self.shared else 'process',
+            'providers': {
+                provider: {
+                    'used': self.store.usage(self._user_scope(provider, user_id), self.WINDOW_SECONDS, now),
+                    'limit': limit
+                }
+                for provider, limit in plan_budget.items()
+            }
+        }
+
+    def get_provider_usage(self) -> Dict:
+        """Current usage of each provider-wide budget"""
+        now = time.time()
+        return {
+            provider: {
+                'used': self.store.usage(self._provider_scope(provider), self.WINDOW_SECONDS, now),
+                'limit': limit
+            }
+            for provider, limit in self.PROVIDER_BUDGETS.items()
+        }
+
+    def _limits_for(self, provider: str, tenant: Optional[tuple]) -> Dict[str, int]:
+        limits = {self._provider_scope(provider): self.PROVIDER_BUDGETS[provider]}
+        if tenant:
+            user_id, plan_type = tenant
+            plan_budget = self.PLAN_BUDGETS.get(plan_type, self.PLAN_BUDGETS['free'])
+            limits[self._user_scope(provider, user_id)] = plan_budget[provider]
+        return limits
+
+    def _provider_scope(self, provider: str) -> str:
+        return f'provider:{provider}'
+
+    def _user_scope(self, provider: str, user_id) -> str:
+        return f'user:{user_id}:{provider}'
+
+
+def create_quota_manager(backend: str = 'memory', redis_url: str = None) -> QuotaManager:
+    """Build a QuotaManager for the configured backend, falling back to memory"""
+    logger = logging.getLogger(__name__)
+
+    if backend == 'redis' and redis_url:
+        try:
+            return QuotaManager(RedisQuotaStore(redis_url))
+        except Exception as e:
+            logger.warning(f"Redis quota store unavailable, using in-process store: {str(e)}")
+
+    # The web app and the scheduler worker are separate processes
+    logger.warning(
+        "API quota is tracked per process: budgets are enforced separately in the web app "
+        "and each worker, and /quota/usage only sees this process's calls. "
+        "Set QUOTA_BACKEND=redis to share them."
+    )
+    return QuotaManager(InMemoryQuotaStore())
@@ -0,0 +1,184 @@
+# services/row_batch.py
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+class RowBatch:
+    """Column-oriented batch of rows.
+
+    Column names are stored once, with one list of values per column, instead
+    of a dict per row that repeats every header. Filtering selects row
+    indices and renaming columns reuses the existing value lists, so the
+    pipeline only builds per-row dicts at the API boundary (``to_dicts``).
+    """
+
+    __slots__ = ('columns', '_index', '_data')
+
+    def __init__(self, columns: Sequence[str] = (), data: List[list] = None):
+        self.columns = []
+        self._index = {}
+        self._data = []
+        for column in columns:
+            self._add_column(column)
+        if data is not None:
+            if len(data) != len(self.columns):
+                raise ValueError('data must hold one value list per column')
+            if len({len(values) for values in data}) > 1:
+                raise ValueError('column value lists must have the same length')
+            self._data = [list(values) for values in data]
+
+    @classmethod
+    def from_values(cls, values: List[list]) -> 'RowBatch':
+        """Build from a Sheets API value range whose first row holds the headers"""
+        if not values:
+            return cls()
+        headers = values[0]
+        batch = cls(headers)
+        columns = batch._data
+        if len(columns) == len(headers):
+            for row in values[1:]:
+                # Pad rows shorter than the headers with empty strings
+                if len(row) < len(headers):
+                    row = row + [''] * (len(headers) - len(row))
+                for column_values, value in zip(columns, row):
+                    column_values.append(value)
+            return batch
+        
+        # Duplicate headers keep the last value, as per-row dicts would
+        positions = [batch._index[column] for column in headers]
+        for row in values[1:]:
+            record = [''] * len(columns)
+            for position, value in zip(positions, row):
+                record[position] = value
+            batch.append(record)
+        return batch
+
+    @classmethod
+    def from_dicts(cls, rows: Iterable[Dict], columns: Sequence[str] = None) -> 'RowBatch':
+        """Build from dict rows; missing values become empty strings"""
+        rows = list(rows)
+        if columns is None:
+            columns = []
+            seen = set()
+            for row in rows:
+                for column in row:
+                    if column not in seen:
+                        seen.add(column)
+                        columns.append(column)
+        batch = cls(columns)
+        for column, values in zip(batch.columns, batch._data):
+            values.extend(row.get(column, '') for row in rows)
+        return batch
+
+    @classmethod
+    def from_payload(cls, payload) -> 'RowBatch':
+        """Inverse of ``to_payload``; also accepts a plain list of dict rows"""
+        if not payload:
+            return cls()
+        if isinstance(payload, list):
+            return cls.from_dicts(payload)
+        return cls(payload['columns'], payload['data'])
+
+    def __len__(self) -> int:
+        return len(self._data[0]) if self._data else 0
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __repr__(self) -> str:
+        return f'RowBatch(columns={self.columns!r}, rows={len(self)})'
+
+    def __getstate__(self):
+        return {'columns': self.columns, 'data': self._data}
+
+    def __setstate__(self, state):
+        self.columns = []
+        self._index = {}
+        self._data = []
+        for column in state['columns']:
+            self._add_column(column)
+        self._data = state['data']
+
+    def has_column(self, column: str) -> bool:
+        return column in self._index
+
+    def column(self, column: str) -> list:
+        """Values of one column; read-only, the list is shared with derived batches"""
+        return self._data[self._index[column]]
+
+    def get(self, row: int, column: str, default: Any = None) -> Any:
+        position = self._index.get(column)
+        return default if position is None else self._data[position][row]
+
+    def append(self, values: Sequence):
+        """Add a row given its values in column order"""
+        if len(values) != len(self.columns):
+            raise ValueError(f'Expected {len(self.columns)} values, got {len(values)}')
+        for column_values, value in zip(self._data, values):
+            column_values.append(value)
+
+    def extend(self, other: 'RowBatch'):
+        """Append every row of another batch; columns it lacks are filled with ''"""
+        if not other:
+            return
+        count = len(other)
+        for column in other.columns:
+            if column not in self._index:
+                self._add_column(column, [''] * len(self))
+        for column, values in zip(self.columns, self._data):
+            if other.has_column(column):
+                values.extend(other.column(column))
+            else:
+                values.extend([''] * count)
+
+    def take(self, indices: Sequence[int]) -> 'RowBatch':
+        """New batch holding only the given rows, in the given order"""
+        batch = RowBatch(self.columns)
+        batch._data = [[values[i] for i in indices] for values in self._data]
+        return batch
+
+    def head(self, count: int) -> 'RowBatch':
+        batch = RowBatch(self.columns)
+        batch._data = [values[:count] for values in self._data]
+        return batch
+
+    def rename(self, pairs: Iterable[Tuple[str, str]]) -> 'RowBatch':
+        """New batch with columns ``(source, target)``; value lists are shared, not copied.
+
+        Sources missing from this batch are skipped; a repeated target keeps
+        the last source, like assigning into a dict.
+        """
+        batch = RowBatch()
+        for source, target in pairs:
+            if source not in self._index:
+                continue
+            values = self._data[self._index[source]]
+            if target in batch._index:
+                batch._data[batch._index[target]] = values
+            else:
+                batch._add_column(target, values)
+        return batch
+
+    def rows(self) -> Iterator[tuple]:
+        """Row value tuples, in column order"""
+        return zip(*self._data) if self._data else iter(())
+
+    def to_dicts(self) -> List[Dict]:
+        """One dict per row; only for API responses and per-row API payloads"""
+        columns = self.columns
+        return [dict(zip(columns, record)) for record in self.rows()]
+
+    def to_values(self) -> List[list]:
+        """Header row plus stringified rows, as the Sheets API expects"""
+        values = [list(self.columns)]
+        values.extend([str(value) for value in record] for record in self.rows())
+        return values
+
+    def to_payload(self) -> Dict:
+        """JSON-serialisable column form, e.g. for checkpoints"""
+        return {'columns': list(self.columns), 'data': [list(values) for values in self._data]}
+
+    def _add_column(self, column: str, values: list = None):
+        if column in self._index:
+            return
+        self._index[column] = len(self.columns)
+        self.columns.append(column)
+        self._data.append([] if values is None else values)
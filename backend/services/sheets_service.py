@@ -1,85 +1,100 @@
 # services/sheets_service.py
 import json
 import logging
-from typing import Dict, List
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import time
+from typing import Dict, List, Union
+from services.cache import ResponseCache, token_fingerprint
+from services.quota import QuotaManager
+from services.single_flight import SingleFlight
+from services.row_batch import RowBatch
+from services.profiling import record_http_call, normalize_endpoint
+from services.metrics import observe_http_call, HTTP_CLIENT_RETRIES
 
 class SheetsService:
-    def __init__(self):
+    INFO_CACHE_TTL = 300
+    MAX_RETRIES = 3
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, cache: ResponseCache = None, quota: QuotaManager = None,
+                 single_flight: SingleFlight = None):
+        self.cache = cache or ResponseCache()
+        self.quota = quota or QuotaManager()
+        self.single_flight = single_flight or SingleFlight()
         self.logger = logging.getLogger(__name__)
 
-    def get_sheet_data(self, sheet_id: str, access_token: str, range_name: str = 'A:Z') -> List[Dict]:
-        """Fetch data from Google Sheets"""
+    def get_sheet_data(self, sheet_id: str, access_token: str, range_name: str = 'A:Z',
+                       reuse_recent: bool = True) -> RowBatch:
+        """Fetch data from Google Sheets.
+
+        Concurrent or back-to-back reads of the same range share one fetch;
+        ``reuse_recent=False`` only joins a fetch still in flight. The
+        returned rows are shared and must not be mutated.
+        """
+        key = f'sheets:data:{sheet_id}:{range_name}:{token_fingerprint(access_token)}'
+        data, _ = self.single_flight.do(
+            key,
+            lambda: self._fetch_sheet_data(sheet_id, access_token, range_name),
+            reuse_finished=reuse_recent
+        )
+        return data
+
+    def _fetch_sheet_data(self, sheet_id: str, access_token: str, range_name: str) -> RowBatch:
+        """Read a range into a column-oriented batch, using the first row as headers"""
         try:
             service = self._get_service(access_token)
             
             # Get values
-            result = service.spreadsheets().values().get(
+            result = self._execute(service.spreadsheets().values().get(
                 spreadsheetId=sheet_id,
                 range=range_name
-            ).execute()
-            
-            values = result.get('values', [])
-            if not values:
-                return []
-            
-            # Convert to list of dictionaries using first row as headers
-            headers = values[0] if values else []
-            data_rows = values[1:] if len(values) > 1 else []
+            ))
             
-            formatted_data = []
-            for row in data_rows:
-                # Pad row with empty strings if shorter than headers
-                padded_row = row + [''] * (len(headers) - len(row))
-                row_dict = dict(zip(headers, padded_row))
-                formatted_data.append(row_dict)
-            
-            return formatted_data
+            return RowBatch.from_values(result.get('values', []))
             
         except Exception as e:
             self.logger.error(f"Failed to fetch sheet data: {str(e)}")
             raise
 
-    def update_sheet(self, sheet_id: str, data: List[Dict], access_token: str):
-        """Update Google Sheets with data"""
+    def update_sheet(self, sheet_id: str, data: Union[RowBatch, List[Dict]], access_token: str):
+        """Replace the sheet's contents with data.
+
+        Empty data still clears the sheet, keeping only the header row when
+        the batch has columns, so rows deleted at the source disappear.
+        """
         try:
-            if not data:
+            if data is None:
                 return
             
             service = self._get_service(access_token)
             
-            # Prepare data for batch update
-            headers = list(data[0].keys()) if data else []
-            values = [headers]  # Start with headers
-            
-            for row in data:
-                row_values = [str(row.get(header, '')) for header in headers]
-                values.append(row_values)
+            # Header row followed by the data rows
+            values = self._as_batch(data).to_values()
             
             # Clear existing content first
-            service.spreadsheets().values().clear(
+            self._execute(service.spreadsheets().values().clear(
                 spreadsheetId=sheet_id,
                 range='A:Z',
                 body={}
-            ).execute()
+            ))
             
             # Update with new data
-            service.spreadsheets().values().update(
-                spreadsheetId=sheet_id,
-                range='A1',
-                valueInputOption='RAW',
-                body={'values': values}
-            ).execute()
-            
+            if values[0]:
+                self._execute(service.spreadsheets().values().update(
+                    spreadsheetId=sheet_id,
+                    range='A1',
+                    valueInputOption='RAW',
+                    body={'values': values}
+                ))
+            
+            self.invalidate_sheet_info(sheet_id)
+            self.single_flight.forget(f'sheets:data:{sheet_id}:')
             self.logger.info(f"Updated sheet with {len(data)} rows")
             
         except Exception as e:
             self.logger.error(f"Failed to update sheet: {str(e)}")
             raise
 
-    def append_to_sheet(self, sheet_id: str, data: List[Dict], access_token: str):
+    def append_to_sheet(self, sheet_id: str, data: Union[RowBatch, List[Dict]], access_token: str):
         """Append data to Google Sheets"""
         try:
             if not data:
@@ -87,35 +102,38 @@ class SheetsService:
                 
             service = self._get_service(access_token)
             
-            headers = list(data[0].keys()) if data else []
-            values = []
-            
-            for row in data:
-                row_values = [str(row.get(header, '')) for header in headers]
-                values.append(row_values)
+            values = self._as_batch(data).to_values()[1:]
             
-            service.spreadsheets().values().append(
+            self._execute(service.spreadsheets().values().append(
                 spreadsheetId=sheet_id,
                 range='A1',
                 valueInputOption='RAW',
                 insertDataOption='INSERT_ROWS',
                 body={'values': values}
-            ).execute()
+            ))
+            
+            self.invalidate_sheet_info(sheet_id)
+            self.single_flight.forget(f'sheets:data:{sheet_id}:')
             
         except Exception as e:
             self.logger.error(f"Failed to append to sheet: {str(e)}")
             raise
 
     def get_sheet_info(self, sheet_id: str, access_token: str) -> Dict:
-        """Get sheet metadata"""
+        """Get sheet metadata, served from cache when fresh"""
+        cache_key = f'sheets:info:{sheet_id}:{token_fingerprint(access_token)}'
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             service = self._get_service(access_token)
             
-            result = service.spreadsheets().get(
+            result = self._execute(service.spreadsheets().get(
                 spreadsheetId=sheet_id
-            ).execute()
+            ))
             
-            return {
+            info = {
                 'title': result.get('properties', {}).get('title', ''),
                 'sheets': [
                     {
@@ -126,12 +144,57 @@ class SheetsService:
                 ]
             }
             
+            self.cache.set(cache_key, info, ttl=self.INFO_CACHE_TTL)
+            return info
+            
         except Exception as e:
             self.logger.error(f"Failed to get sheet info: {str(e)}")
             raise
 
+    def invalidate_sheet_info(self, sheet_id: str):
+        """Drop cached metadata for a spreadsheet (all tokens)"""
+        self.cache.invalidate_prefix(f'sheets:info:{sheet_id}:')
+
+    def _execute(self, request):
+        """Execute a Sheets API request once quota is available, retrying 429s and 5xx"""
+        from googleapiclient.errors import HttpError
+        
+        method = getattr(request, 'method', 'GET')
+        endpoint = getattr(request, 'methodId', None) or normalize_endpoint(getattr(request, 'uri', ''))
+        
+        for attempt in range(self.MAX_RETRIES + 1):
+            self.quota.acquire('sheets')
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                result = request.execute()
+                status = 200
+                return result
+            except HttpError as e:
+                status = e.resp.status
+                if status not in self.RETRY_STATUSES or attempt == self.MAX_RETRIES:
+                    raise
+            finally:
+                elapsed = time.perf_counter() - started
+                record_http_call('sheets', method, endpoint, status, elapsed)
+                observe_http_call('sheets', endpoint, status, elapsed)
+            
+            HTTP_CLIENT_RETRIES.inc(provider='sheets', endpoint=endpoint, status=status)
+            self.logger.warning(f"Sheets returned {status} for {endpoint}, retrying in {2 ** attempt}s")
+            time.sleep(2 ** attempt)
+
+    def _as_batch(self, data) -> RowBatch:
+        if isinstance(data, RowBatch):
+            return data
+        # Dict rows take their columns from the first row
+        return RowBatch.from_dicts(data, columns=list(data[0].keys()))
+
     def _get_service(self, access_token: str):
         """Create Google Sheets API service"""
+        # The Google client stack is slow to import; load it on first use
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+        
         credentials = Credentials(token=access_token)
         service = build('sheets', 'v4', credentials=credentials)
         return service
\ No newline at end of file
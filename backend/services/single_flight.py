@@ -0,0 +1,82 @@
+# services/single_flight.py
+import logging
+import threading
+import time
+from typing import Any, Callable, Tuple
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'finished_at')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    """Collapses concurrent or closely spaced fetches of the same source into one.
+
+    The first caller for a key runs the fetch; callers arriving while it is in
+    flight wait for it and share its result. A finished result keeps being
+    handed out for ``share_window`` seconds, so syncs started back to back
+    reuse it too. Results are shared objects and must be treated as read-only.
+    """
+
+    def __init__(self, share_window: float = 30.0):
+        self.share_window = share_window
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def do(self, key: str, fetch: Callable[[], Any], reuse_finished: bool = True) -> Tuple[Any, bool]:
+        """Return ``(result, shared)``; ``shared`` is True when another caller fetched it.
+
+        With ``reuse_finished=False`` only a fetch still in flight is joined;
+        a finished result is replaced by a new fetch.
+        """
+        with self._lock:
+            self._evict_expired()
+            call = self._calls.get(key)
+            if call is not None and not reuse_finished and call.done.is_set():
+                call = None
+            owner = call is None
+            if owner:
+                call = _Call()
+                self._calls[key] = call
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            self.logger.debug(f"Reusing in-flight fetch for {key}")
+            return call.result, True
+
+        try:
+            call.result = fetch()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                # Failures are never shared with later callers
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            raise
+        finally:
+            call.finished_at = time.monotonic()
+            call.done.set()
+
+    def forget(self, prefix: str):
+        """Drop finished results whose key starts with prefix, e.g. after writing to the source"""
+        with self._lock:
+            for key in [k for k, call in self._calls.items() if k.startswith(prefix) and call.done.is_set()]:
+                del self._calls[key]
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [
+            key for key, call in self._calls.items()
+            if call.finished_at is not None and now - call.finished_at > self.share_window
+        ]
+        for key in expired:
+            del self._calls[key]
@@ -0,0 +1,201 @@
+# services/snapshot_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from services.row_batch import RowBatch
+
+class SnapshotStore:
+    """Per-sync local copy of the last synced Notion and Sheets rows.
+
+    Each sync gets its own SQLite file with one table per side. Every field
+    is a real column (values are stored natively, not as JSON blobs) and
+    ``_key`` is the primary key, so key lookups use the index and scans read
+    plain tuples. Reads are memory-mapped.
+    """
+
+    SIDES = ('notion', 'sheets')
+    KEY_COLUMN = '_key'
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, base_dir: str = 'data/snapshots'):
+        self.base_dir = base_dir
+        self._write_locks = {}
+        self._locks_guard = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def replace(self, sync_id: int, side: str, rows: Union[RowBatch, List[Dict]], keys: List[str]):
+        """Atomically replace the snapshot for one side of a sync"""
+        self._check_side(side)
+        if len(rows) != len(keys):
+            raise ValueError('rows and keys must have the same length')
+        if not isinstance(rows, RowBatch):
+            rows = RowBatch.from_dicts(rows)
+
+        columns = []
+        seen = {self.KEY_COLUMN}
+        for column in rows.columns:
+            # SQLite column names are case-insensitive
+            folded = str(column).lower()
+            if folded in seen:
+                self.logger.warning(f"Snapshot for sync {sync_id} drops clashing column {column!r}")
+                continue
+            seen.add(folded)
+            columns.append(column)
+        value_lists = [rows.column(column) for column in columns]
+
+        staging = f'{side}_staging'
+        column_defs = ', '.join(self._quote(c) for c in columns)
+        placeholders = ', '.join('?' * (len(columns) + 1))
+
+        with self._write_lock(sync_id), self._session(sync_id) as conn:
+            conn.execute(f'DROP TABLE IF EXISTS {staging}')
+            conn.execute(
+                f'CREATE TABLE {staging} ({self.KEY_COLUMN} TEXT PRIMARY KEY'
+                f'{", " + column_defs if columns else ""}) WITHOUT ROWID'
+            )
+            conn.executemany(
+                f'INSERT OR REPLACE INTO {staging} VALUES ({placeholders})',
+                (
+                    (str(key), *[self._encode(values[i]) for values in value_lists])
+                    for i, key in enumerate(keys)
+                )
+            )
+            conn.execute(f'DROP TABLE IF EXISTS {side}')
+            conn.execute(f'ALTER TABLE {staging} RENAME TO {side}')
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshot_meta (side, row_count, updated_at) VALUES (?, ?, ?)',
+                (side, len(rows), datetime.utcnow().isoformat())
+            )
+
+    def get(self, sync_id: int, side: str, key: str) -> Optional[Dict]:
+        """Look up one row by key"""
+        return self.get_many(sync_id, side, [key]).get(str(key))
+
+    def get_many(self, sync_id: int, side: str, keys: List[str]) -> Dict[str, Dict]:
+        """Look up several rows by key"""
+        self._check_side(side)
+        if not keys or not self._exists(sync_id):
+            return {}
+
+        found = {}
+        with self._session(sync_id) as conn:
+            if not self._has_table(conn, side):
+                return {}
+            columns = self._columns(conn, side)
+            keys = [str(key) for key in keys]
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                cursor = conn.execute(
+                    f'SELECT * FROM {side} WHERE {self.KEY_COLUMN} IN ({", ".join("?" * len(chunk))})',
+                    chunk
+                )
+                for record in cursor:
+                    found[record[0]] = dict(zip(columns, record[1:]))
+        return found
+
+    def keys(self, sync_id: int, side: str) -> List[str]:
+        """All keys in a side's snapshot"""
+        self._check_side(side)
+        if not self._exists(sync_id):
+            return []
+        with self._session(sync_id) as conn:
+            if not self._has_table(conn, side):
+                return []
+            return [record[0] for record in conn.execute(f'SELECT {self.KEY_COLUMN} FROM {side}')]
+
+    def scan(self, sync_id: int, side: str, columns: List[str] = None) -> Tuple[List[str], Iterator[tuple]]:
+        """Return ``(column_names, rows)`` where rows yields plain tuples, key first"""
+        self._check_side(side)
+        if not self._exists(sync_id):
+            return [self.KEY_COLUMN], iter(())
+
+        conn = self._connect(sync_id)
+        if not self._has_table(conn, side):
+            conn.close()
+            return [self.KEY_COLUMN], iter(())
+
+        available = self._columns(conn, side)
+        selected = [c for c in (columns or available) if c in available]
+        select_list = ', '.join([self.KEY_COLUMN] + [self._quote(c) for c in selected])
+        cursor = conn.execute(f'SELECT {select_list} FROM {side}')
+
+        def rows():
+            try:
+                yield from cursor
+            finally:
+                conn.close()
+
+        return [self.KEY_COLUMN] + selected, rows()
+
+    def info(self, sync_id: int) -> Dict:
+        """Row counts and update times per side"""
+        if not self._exists(sync_id):
+            return {}
+        with self._session(sync_id) as conn:
+            return {
+                side: {'row_count': row_count, 'updated_at': updated_at}
+                for side, row_count, updated_at in conn.execute('SELECT side, row_count, updated_at FROM snapshot_meta')
+            }
+
+    def delete(self, sync_id: int):
+        """Remove every snapshot for a sync"""
+        path = self._path(sync_id)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    @contextmanager
+    def _session(self, sync_id: int):
+        conn = self._connect(sync_id)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self, sync_id: int) -> sqlite3.Connection:
+        os.makedirs(self.base_dir, exist_ok=True)
+        conn = sqlite3.connect(self._path(sync_id), timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS snapshot_meta '
+            '(side TEXT PRIMARY KEY, row_count INTEGER, updated_at TEXT)'
+        )
+        return conn
+
+    def _write_lock(self, sync_id: int) -> threading.Lock:
+        with self._locks_guard:
+            return self._write_locks.setdefault(sync_id, threading.Lock())
+
+    def _path(self, sync_id: int) -> str:
+        return os.path.join(self.base_dir, f'sync_{int(sync_id)}.sqlite')
+
+    def _exists(self, sync_id: int) -> bool:
+        return os.path.exists(self._path(sync_id))
+
+    def _has_table(self, conn: sqlite3.Connection, side: str) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (side,)
+        ).fetchone() is not None
+
+    def _columns(self, conn: sqlite3.Connection, side: str) -> List[str]:
+        return [info[1] for info in conn.execute(f'PRAGMA table_info({side})')][1:]
+
+    def _check_side(self, side: str):
+        if side not in self.SIDES:
+            raise ValueError(f'Unknown snapshot side: {side}')
+
+    def _quote(self, column: str) -> str:
+        return '"' + str(column).replace('"', '""') + '"'
+
+    def _encode(self, value):
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return json.dumps(value, default=str)
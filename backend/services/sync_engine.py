@@ -1,136 +1,529 @@
 # services/sync_engine.py
+import hashlib
+import json
 import logging
+import os
+import time
+import requests
+from contextlib import nullcontext
 from datetime import datetime
 from models.log import SyncLog
 from models.sync import Sync
-from app import db
+from services.checkpoints import CheckpointManager
+from services.quota import QuotaManager
+from services.snapshot_store import SnapshotStore
+from services.row_batch import RowBatch
+from services.transform_pool import TransformPool, title_text, rich_text
+from services.profiling import RunProfiler, profile_phase
+from services.metrics import SYNC_DURATION, SYNC_ROWS, SYNC_ROWS_PER_SECOND, SYNCS_IN_PROGRESS
+from extensions import db
 
 class SyncEngine:
-    def __init__(self, notion_service, sheets_service):
+    # Mapping source that exports each page's body text instead of a property
+    PAGE_BODY_FIELD = '__page_body__'
+    # A run that would archive more than this share of the previously synced rows is refused
+    MAX_DELETE_RATIO = 0.5
+
+    def __init__(self, notion_service, sheets_service, checkpoints=None, quota=None, snapshots=None,
+                 profile_dir='data/profiles', transform_pool=None):
         self.notion_service = notion_service
         self.sheets_service = sheets_service
+        self.checkpoints = checkpoints or CheckpointManager()
+        self.quota = quota or QuotaManager()
+        self.snapshots = snapshots or SnapshotStore()
+        self.profile_dir = profile_dir
+        self.transform_pool = transform_pool or TransformPool()
         self.logger = logging.getLogger(__name__)
 
-    def run_sync(self, sync):
-        """Main sync execution method"""
+    def run_sync(self, sync, profile=False, reuse_recent=True):
+        """Main sync execution method.
+
+        With ``profile=True`` the run is wrapped in a RunProfiler and its
+        artifact is stored alongside the run's final SyncLog entry.
+        ``reuse_recent=False`` (manual runs) never reuses a source fetch that
+        another sync finished moments ago, so just-made edits are seen.
+        """
+        started = time.monotonic()
+        rows_processed = 0
+        rows_changed = 0
+        profiler = RunProfiler() if profile else None
+        log = None
+        SYNCS_IN_PROGRESS.inc()
         try:
             self._log_sync_start(sync)
             
-            if sync.sync_direction in ['notion_to_sheets', 'both']:
-                self._sync_notion_to_sheets(sync)
-            
-            if sync.sync_direction in ['sheets_to_notion', 'both']:
-                self._sync_sheets_to_notion(sync)
+            # Attribute every API call made during this run to the sync's owner
+            with profiler or nullcontext(), self.quota.tenant(sync.user_id, sync.user.plan_type):
+                # Before any direction runs, so a two-way sync doesn't restore the deleted rows first
+                if sync.propagate_deletions and sync.sync_direction in ['sheets_to_notion', 'both']:
+                    with profile_phase('deletions'):
+                        rows_changed += self._propagate_sheet_deletions(sync, reuse_recent)
+                
+                if sync.sync_direction in ['notion_to_sheets', 'both']:
+                    processed, changed = self._run_direction(
+                        sync, 'notion_to_sheets', self._sync_notion_to_sheets, reuse_recent
+                    )
+                    rows_processed += processed
+                    rows_changed += changed
+                
+                if sync.sync_direction in ['sheets_to_notion', 'both']:
+                    processed, changed = self._run_direction(
+                        sync, 'sheets_to_notion', self._sync_sheets_to_notion, reuse_recent
+                    )
+                    rows_processed += processed
+                    rows_changed += changed
             
             # Update last sync time
             sync.last_sync = datetime.utcnow()
             sync.status = 'active'
             db.session.commit()
             
-            self._log_sync_success(sync)
-            return {'status': 'success', 'message': 'Sync completed successfully'}
+            log = self._log_sync_success(sync, rows_processed, time.monotonic() - started, rows_changed)
+            result = {'status': 'success', 'message': 'Sync completed successfully'}
+            if profiler:
+                result['profile_log_id'] = log.id
+            return result
             
         except Exception as e:
             self.logger.error(f"Sync {sync.id} failed: {str(e)}")
-            self._log_sync_error(sync, str(e))
+            log = self._log_sync_error(sync, str(e), time.monotonic() - started)
             sync.status = 'error'
             db.session.commit()
             raise
+        
+        finally:
+            SYNCS_IN_PROGRESS.dec()
+            if profiler and log:
+                self._save_profile(sync, log, profiler)
+
+    def _run_direction(self, sync, direction, handler, reuse_recent=True):
+        """Run one sync direction and record its duration and throughput"""
+        started = time.perf_counter()
+        try:
+            processed, changed = handler(sync, reuse_recent)
+        except Exception:
+            SYNC_DURATION.observe(time.perf_counter() - started, direction=direction, outcome='error')
+            raise
+        
+        elapsed = time.perf_counter() - started
+        SYNC_DURATION.observe(elapsed, direction=direction, outcome='success')
+        SYNC_ROWS.inc(processed, direction=direction)
+        SYNC_ROWS_PER_SECOND.set(processed / elapsed if elapsed > 0 else 0.0, direction=direction)
+        return processed, changed
+
+    def _save_profile(self, sync, log, profiler):
+        """Store the profile artifact next to the run's log entry"""
+        try:
+            directory = os.path.join(self.profile_dir, f'sync_{sync.id}')
+            log.profile_path = profiler.save(directory, f'log_{log.id}')
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.logger.warning(f"Failed to save profile for sync {sync.id}: {str(e)}")
+
+    def preview_sync(self, sync, mapping=None, filters=None, limit=25):
+        """Dry-run a sync on the first page of source rows without writing anything.
+
+        Runs the same transform, filter and relation resolution as a real run
+        and estimates how many rows a full run would write, using the last
+        snapshot's row counts when the sample is not the whole source.
+        """
+        started = time.monotonic()
+        user = sync.user
+        mapping = sync.mapping if mapping is None else mapping
+        filters = sync.filters if filters is None else filters
+        limit = max(1, min(int(limit), 100))
+        snapshot_info = self._snapshot_info(sync)
+        preview = {'sync_id': sync.id, 'directions': {}}
+        
+        with self.quota.tenant(sync.user_id, user.plan_type):
+            if sync.sync_direction in ['notion_to_sheets', 'both']:
+                pages, has_more = self.notion_service.query_database_page(
+                    sync.notion_database_id,
+                    user.notion_access_token,
+                    filters=filters,
+                    page_size=limit
+                )
+                rows = self._transform_notion_to_sheets(pages, mapping, user.notion_access_token)
+                
+                # Filters run server-side here and the sheet is rewritten in full
+                if not has_more:
+                    estimate = len(rows)
+                else:
+                    estimate = snapshot_info.get('notion', {}).get('row_count')
+                
+                preview['directions']['notion_to_sheets'] = {
+                    'sampled_rows': len(pages),
+                    'complete_sample': not has_more,
+                    'rows': rows.to_dicts(),
+                    'estimated_writes': estimate
+                }
+            
+            if sync.sync_direction in ['sheets_to_notion', 'both']:
+                # Header row plus the sample
+                sheets_data = self.sheets_service.get_sheet_data(
+                    sync.sheet_id,
+                    user.google_access_token,
+                    range_name=f'A1:Z{limit + 1}',
+                    reuse_recent=False
+                )
+                filtered_data = self._apply_filters(sheets_data, filters)
+                rows = self._transform_sheets_to_notion(filtered_data, mapping)
+                
+                complete = len(sheets_data) < limit
+                if complete:
+                    estimate = len(rows)
+                else:
+                    total = snapshot_info.get('sheets', {}).get('row_count')
+                    estimate = round(total * len(filtered_data) / len(sheets_data)) if total else None
+                
+                preview['directions']['sheets_to_notion'] = {
+                    'sampled_rows': len(sheets_data),
+                    'complete_sample': complete,
+                    'rows': rows.to_dicts(),
+                    'estimated_writes': estimate
+                }
+        
+        preview['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        return preview
 
-    def _sync_notion_to_sheets(self, sync):
+    def _snapshot_info(self, sync):
+        try:
+            return self.snapshots.info(sync.id)
+        except Exception as e:
+            self.logger.warning(f"Failed to read snapshot info for sync {sync.id}: {str(e)}")
+            return {}
+
+    def _sync_notion_to_sheets(self, sync, reuse_recent=True):
         """Sync from Notion to Google Sheets"""
         # Get user tokens
         user = sync.user
         
-        # Fetch Notion data
-        notion_data = self.notion_service.get_database_rows(
-            sync.notion_database_id,
-            user.notion_access_token,
-            filters=sync.filters
-        )
+        # A run that must see recent edits never reuses rows fetched by a failed attempt
+        checkpoint = self.checkpoints.begin(sync, 'notion_to_sheets', resume_fetch=reuse_recent)
+        transformed_data = self.checkpoints.fetched_rows(checkpoint)
+        page_ids = list(checkpoint.fetched_keys or [])
         
-        # Transform data according to mapping
-        transformed_data = self._transform_notion_to_sheets(notion_data, sync.mapping)
+        if not checkpoint.fetch_completed:
+            # Pages are transformed in groups so large groups can go to the transform pool
+            pending_pages = []
+            
+            def transform_pending():
+                if pending_pages:
+                    with profile_phase('transform'):
+                        transformed_data.extend(
+                            self._transform_notion_to_sheets(pending_pages, sync.mapping, user.notion_access_token)
+                        )
+                    pending_pages.clear()
+            
+            def on_page(page_number, page_rows, next_cursor):
+                pending_pages.extend(page_rows)
+                page_ids.extend(page.get('id') for page in page_rows)
+                # Transform before any checkpoint save so it holds compact sheet rows
+                if len(pending_pages) >= self.transform_pool.min_batch_rows or \
+                        page_number % self.checkpoints.SAVE_EVERY_PAGES == 0:
+                    transform_pending()
+                with profile_phase('checkpoint'):
+                    self.checkpoints.save_fetch_progress(
+                        checkpoint, page_number, next_cursor, transformed_data, page_ids
+                    )
+            
+            # Fetch Notion data, resuming from the saved cursor if there is one
+            try:
+                with profile_phase('notion_fetch'):
+                    self.notion_service.get_database_rows(
+                        sync.notion_database_id,
+                        user.notion_access_token,
+                        filters=sync.filters,
+                        start_cursor=checkpoint.notion_cursor,
+                        on_page=on_page,
+                        reuse_recent=reuse_recent
+                    )
+            except requests.exceptions.HTTPError as e:
+                if not checkpoint.notion_cursor or e.response is None or e.response.status_code != 400:
+                    raise
+                # Cursor expired or rejected; fall back to a full fetch
+                self.logger.warning(f"Checkpoint cursor rejected for sync {sync.id}, refetching from start")
+                self.checkpoints.reset_fetch(checkpoint)
+                transformed_data = RowBatch()
+                page_ids = []
+                pending_pages.clear()
+                with profile_phase('notion_fetch'):
+                    self.notion_service.get_database_rows(
+                        sync.notion_database_id,
+                        user.notion_access_token,
+                        filters=sync.filters,
+                        on_page=on_page,
+                        reuse_recent=reuse_recent
+                    )
+            
+            transform_pending()
+            self.checkpoints.mark_fetch_completed(checkpoint, transformed_data, page_ids)
+        
+        with profile_phase('change_detection'):
+            rows_changed = self._count_notion_changes(sync, transformed_data)
         
         # Update Google Sheets
-        self.sheets_service.update_sheet(
-            sync.sheet_id,
-            transformed_data,
-            user.google_access_token
-        )
+        with profile_phase('sheets_write'):
+            self.sheets_service.update_sheet(
+                sync.sheet_id,
+                transformed_data,
+                user.google_access_token
+            )
+        
+        self.checkpoints.complete(checkpoint)
+        
+        # The sheet now mirrors the Notion rows, keyed by page id and by sheet row number
+        with profile_phase('snapshot'):
+            self._update_snapshot(sync, 'notion', transformed_data, page_ids)
+            self._update_snapshot(sync, 'sheets', transformed_data, self._sheet_row_keys(transformed_data))
         
         self.logger.info(f"Synced {len(transformed_data)} rows from Notion to Sheets")
+        return len(transformed_data), rows_changed
 
-    def _sync_sheets_to_notion(self, sync):
+    def _sync_sheets_to_notion(self, sync, reuse_recent=True):
         """Sync from Google Sheets to Notion"""
         # Get user tokens
         user = sync.user
         
+        checkpoint = self.checkpoints.begin(sync, 'sheets_to_notion')
+        
         # Fetch Sheets data
-        sheets_data = self.sheets_service.get_sheet_data(
-            sync.sheet_id,
-            user.google_access_token
-        )
+        with profile_phase('sheets_fetch'):
+            sheets_data = self.sheets_service.get_sheet_data(
+                sync.sheet_id,
+                user.google_access_token,
+                reuse_recent=reuse_recent
+            )
+        
+        with profile_phase('change_detection'):
+            rows_changed = self._count_sheet_changes(sync, sheets_data)
         
         # Apply filters if any
-        filtered_data = self._apply_filters(sheets_data, sync.filters)
+        with profile_phase('filter'):
+            filtered_data = self._apply_filters(sheets_data, sync.filters)
         
         # Transform data according to mapping
-        transformed_data = self._transform_sheets_to_notion(filtered_data, sync.mapping)
+        with profile_phase('transform'):
+            transformed_data = self._transform_sheets_to_notion(filtered_data, sync.mapping)
+        
+        # Notion takes one payload per page, so rows become dicts here
+        # Skip rows an earlier attempt of this run already wrote
+        pending_data = self.checkpoints.pending_rows(checkpoint, transformed_data.to_dicts())
+        if len(pending_data) < len(transformed_data):
+            self.logger.info(
+                f"Skipping {len(transformed_data) - len(pending_data)} rows already written for sync {sync.id}"
+            )
+        
+        last_batch = checkpoint.committed_batch if checkpoint.committed_batch is not None else -1
+        start_batch = last_batch + 1
         
         # Update Notion database
-        self.notion_service.update_database_rows(
-            sync.notion_database_id,
-            transformed_data,
-            user.notion_access_token
-        )
+        with profile_phase('notion_write'):
+            pages_by_title = self.notion_service.update_database_rows(
+                sync.notion_database_id,
+                pending_data,
+                user.notion_access_token,
+                on_batch=lambda batch_index, batch: self.checkpoints.save_write_progress(
+                    checkpoint, start_batch + batch_index, batch
+                )
+            )
         
+        self.checkpoints.complete(checkpoint)
+        with profile_phase('snapshot'):
+            self._update_snapshot(sync, 'sheets', sheets_data, self._sheet_row_keys(sheets_data))
+            self._update_written_pages_snapshot(sync, filtered_data, transformed_data, pages_by_title)
         self.logger.info(f"Synced {len(transformed_data)} rows from Sheets to Notion")
+        return len(transformed_data), rows_changed
+
+    def _propagate_sheet_deletions(self, sync, reuse_recent=True):
+        """Archive the Notion pages of sheet rows deleted since the last run.
+
+        Rows are identified by the sheet column mapped to the database's
+        title property. The previous key set and each key's pages come from
+        the notion snapshot, which is keyed by page id, so only pages this
+        sync wrote or read are ever archived, and nothing is deleted on a
+        first run or without a snapshot.
+        """
+        user = sync.user
+        title_field = self._notion_title_field(sync)
+        key_column = (sync.mapping or {}).get(title_field) if title_field else None
+        if not key_column:
+            self.logger.warning(f"Sync {sync.id} does not map the Notion title property; deletions not tracked")
+            return 0
+        
+        previous_pages = self._snapshot_pages_by_key(sync, key_column)
+        previous_keys = set(previous_pages)
+        if not previous_keys:
+            return 0
+        
+        sheets_data = self.sheets_service.get_sheet_data(
+            sync.sheet_id, user.google_access_token, reuse_recent=reuse_recent
+        )
+        if not sheets_data.has_column(key_column):
+            self.logger.warning(f"Sheet for sync {sync.id} has no '{key_column}' column; deletions not tracked")
+            return 0
+        
+        current_keys = {str(value) for value in sheets_data.column(key_column) if value not in ('', None)}
+        tombstones = sorted(previous_keys - current_keys)
+        if not tombstones:
+            return 0
+        
+        # An emptied or mostly missing sheet is far more likely a mistake than a purge
+        if not current_keys or len(tombstones) > len(previous_keys) * self.MAX_DELETE_RATIO:
+            self.logger.warning(
+                f"Refusing to archive {len(tombstones)} of {len(previous_keys)} rows for sync {sync.id}"
+            )
+            return 0
+        
+        page_ids = [page_id for key in tombstones for page_id in previous_pages[key]]
+        archived = self.notion_service.archive_pages(sync.notion_database_id, page_ids, user.notion_access_token)
+        
+        self.logger.info(f"Archived {archived} Notion pages for {len(tombstones)} deleted sheet rows of sync {sync.id}")
+        return archived
+
+    def _notion_title_field(self, sync):
+        """Name of the database's title property"""
+        schema = self.notion_service.get_database_schema(sync.notion_database_id, sync.user.notion_access_token)
+        for name, prop in (schema or {}).get('properties', {}).items():
+            if prop.get('type') == 'title':
+                return name
+        return None
+
+    def _snapshot_pages_by_key(self, sync, column):
+        """Page ids in the last notion snapshot, grouped by their non-empty ``column`` value"""
+        pages = {}
+        try:
+            _, rows = self.snapshots.scan(sync.id, 'notion', [column])
+            # Rows are (key,) when the column is missing; consume them all so the connection closes
+            for row in rows:
+                if len(row) > 1 and row[-1] not in ('', None):
+                    pages.setdefault(str(row[-1]), []).append(row[0])
+        except Exception as e:
+            self.logger.warning(f"Failed to read notion snapshot for sync {sync.id}: {str(e)}")
+            return {}
+        return pages
+
+    def _update_written_pages_snapshot(self, sync, sheet_rows, notion_rows, pages_by_title):
+        """Record the sheet rows just written to Notion in the notion snapshot, keyed by page id.
+
+        ``notion_rows`` is ``sheet_rows`` renamed to Notion fields, row for row.
+        Rows without a title are left out, and the snapshot is kept as is
+        when an earlier attempt already wrote every row.
+        """
+        title_field = self._notion_title_field(sync)
+        if not pages_by_title or not title_field or not notion_rows.has_column(title_field):
+            return
+        
+        indices = []
+        page_ids = []
+        for index, title in enumerate(notion_rows.column(title_field)):
+            page_id = pages_by_title.get(str(title)) if title not in ('', None) else None
+            if page_id:
+                indices.append(index)
+                page_ids.append(page_id)
+        self._update_snapshot(sync, 'notion', sheet_rows.take(indices), page_ids)
+
+    def _update_snapshot(self, sync, side, rows, keys):
+        """Record the rows just synced; a failed snapshot write never fails the sync"""
+        if len(keys) != len(rows):
+            self.logger.warning(f"Skipping {side} snapshot for sync {sync.id}: row keys unavailable")
+            return
+        try:
+            self.snapshots.replace(sync.id, side, rows, keys)
+        except Exception as e:
+            self.logger.warning(f"Failed to update {side} snapshot for sync {sync.id}: {str(e)}")
+
+    def _sheet_row_keys(self, rows):
+        """Sheet row numbers (row 1 holds the headers)"""
+        return [str(index + 2) for index in range(len(rows))]
 
-    def _transform_notion_to_sheets(self, notion_data, mapping):
+    def _count_notion_changes(self, sync, rows):
+        """Count transformed Notion rows whose content is not in the sheets snapshot.
+
+        Content is compared rather than ``last_edited_time``, which this
+        sync's own writes to Notion bump on every two-way run. Every row
+        counts on a first sync or when the mapped columns changed.
+        """
+        try:
+            columns, snapshot_rows = self.snapshots.scan(sync.id, 'sheets', rows.columns)
+            # Fingerprint every row, consuming the scan so its connection closes
+            previous = {
+                tuple('' if value is None else str(value) for value in record[1:])
+                for record in snapshot_rows
+            }
+        except Exception as e:
+            self.logger.warning(f"Failed to read sheets snapshot for sync {sync.id}: {str(e)}")
+            return len(rows)
+        
+        if not previous or columns[1:] != rows.columns:
+            return len(rows)
+        return sum(
+            1 for record in rows.rows()
+            if tuple('' if value is None else str(value) for value in record) not in previous
+        )
+
+    def _count_sheet_changes(self, sync, rows):
+        """Count sheet rows that were not present verbatim in the previous run"""
+        # Hashed as a dict so fingerprints stay comparable with earlier runs; each dict is short-lived
+        columns = rows.columns
+        fingerprints = [
+            hashlib.md5(json.dumps(dict(zip(columns, record)), sort_keys=True, default=str).encode()).hexdigest()[:12]
+            for record in rows.rows()
+        ]
+        previous = set(sync.sheet_row_hashes or [])
+        sync.sheet_row_hashes = fingerprints
+        if not previous:
+            return len(fingerprints)
+        return sum(1 for fingerprint in fingerprints if fingerprint not in previous)
+
+    def _transform_notion_to_sheets(self, notion_data, mapping, access_token=None):
         """Transform Notion data format to Sheets format"""
-        transformed = []
+        mapping = mapping or {}
+        transformed = RowBatch(mapping.values())
+        fields = [
+            (notion_field, transformed.columns.index(sheets_col))
+            for notion_field, sheets_col in mapping.items()
+            if notion_field != self.PAGE_BODY_FIELD
+        ]
         
-        for row in notion_data:
-            sheets_row = {}
-            
-            for notion_field, sheets_col in mapping.items():
-                value = row.get('properties', {}).get(notion_field, {})
-                
-                # Handle different Notion property types
-                if value.get('type') == 'title':
-                    sheets_row[sheets_col] = self._extract_title_text(value)
-                elif value.get('type') == 'rich_text':
-                    sheets_row[sheets_col] = self._extract_rich_text(value)
-                elif value.get('type') == 'number':
-                    sheets_row[sheets_col] = value.get('number', '')
-                elif value.get('type') == 'select':
-                    sheets_row[sheets_col] = value.get('select', {}).get('name', '')
-                elif value.get('type') == 'relation':
-                    # KEY FEATURE: Show relation names instead of IDs
-                    sheets_row[sheets_col] = self._resolve_relation_names(value, notion_field)
-                elif value.get('type') == 'date':
-                    date_obj = value.get('date', {})
-                    sheets_row[sheets_col] = date_obj.get('start', '') if date_obj else ''
-                else:
-                    sheets_row[sheets_col] = str(value.get('plain_text', ''))
-            
-            transformed.append(sheets_row)
+        # Property flattening is CPU-bound and may run in worker processes
+        records, relations = self.transform_pool.flatten(notion_data, fields, len(transformed.columns))
+        
+        # Related page titles looked up during this call, so repeated relations cost one fetch
+        relation_titles = {}
+        for row_index, position, notion_field, value in relations:
+            # KEY FEATURE: Show relation names instead of IDs
+            records[row_index][position] = self._resolve_relation_names(
+                value, notion_field, access_token, relation_titles
+            )
+        
+        if self.PAGE_BODY_FIELD in mapping:
+            position = transformed.columns.index(mapping[self.PAGE_BODY_FIELD])
+            with profile_phase('page_bodies'):
+                bodies = self.notion_service.get_page_bodies(notion_data, access_token)
+            for record, page in zip(records, notion_data):
+                record[position] = bodies.get(page.get('id'), '')
+        
+        for record in records:
+            transformed.append(record)
         
         return transformed
 
-    def _resolve_relation_names(self, relation_value, field_name):
+    def _resolve_relation_names(self, relation_value, field_name, access_token=None, titles=None):
         """Resolve relation IDs to readable names - KEY DIFFERENTIATOR"""
         try:
             relation_ids = [rel.get('id') for rel in relation_value.get('relation', [])]
             names = []
+            titles = {} if titles is None else titles
             
             for relation_id in relation_ids:
-                # Fetch the related page to get its title
-                related_page = self.notion_service.get_page(relation_id)
-                if related_page:
-                    title = self._extract_page_title(related_page)
-                    names.append(title)
+                if relation_id not in titles:
+                    # Fetch the related page to get its title
+                    related_page = self.notion_service.get_page(relation_id, access_token)
+                    titles[relation_id] = self._extract_page_title(related_page) if related_page else None
+                if titles[relation_id] is not None:
+                    names.append(titles[relation_id])
             
             return ', '.join(names) if names else ''
             
@@ -138,50 +531,53 @@ class SyncEngine:
             self.logger.warning(f"Failed to resolve relation names: {str(e)}")
             return ''
 
+    def _extract_page_title(self, page):
+        """Extract the title of a Notion page from whichever property is its title"""
+        for prop in page.get('properties', {}).values():
+            if prop.get('type') == 'title':
+                return self._extract_title_text(prop)
+        return ''
+
+    def _transform_sheets_to_notion(self, sheets_data, mapping):
+        """Transform Sheets rows to Notion field values using the Notion -> Sheets mapping"""
+        # Renaming columns shares the value lists; no row is copied. Page bodies are export-only.
+        return sheets_data.rename(
+            (sheets_col, notion_field) for notion_field, sheets_col in (mapping or {}).items()
+            if notion_field != self.PAGE_BODY_FIELD
+        )
+
     def _extract_title_text(self, title_property):
         """Extract plain text from Notion title property"""
-        try:
-            title_array = title_property.get('title', [])
-            return ''.join([t.get('plain_text', '') for t in title_array])
-        except:
-            return ''
+        return title_text(title_property)
 
     def _extract_rich_text(self, rich_text_property):
         """Extract plain text from Notion rich text property"""
-        try:
-            rich_text_array = rich_text_property.get('rich_text', [])
-            return ''.join([rt.get('plain_text', '') for rt in rich_text_array])
-        except:
-            return ''
+        return rich_text(rich_text_property)
 
     def _apply_filters(self, data, filters):
         """Apply conditional filters to data"""
         if not filters:
             return data
         
-        filtered_data = []
-        for row in data:
-            include_row = True
+        # Narrow the surviving row indices one filtered column at a time
+        keep = range(len(data))
+        for field, condition in filters.items():
+            if data.has_column(field):
+                column = data.column(field)
+                field_values = {i: str(column[i]).lower() for i in keep}
+            else:
+                field_values = dict.fromkeys(keep, '')
+            filter_value = str(condition.get('value', '')).lower()
+            operator = condition.get('operator', 'equals')
             
-            for field, condition in filters.items():
-                field_value = str(row.get(field, '')).lower()
-                filter_value = str(condition.get('value', '')).lower()
-                operator = condition.get('operator', 'equals')
-                
-                if operator == 'equals' and field_value != filter_value:
-                    include_row = False
-                    break
-                elif operator == 'contains' and filter_value not in field_value:
-                    include_row = False
-                    break
-                elif operator == 'not_empty' and not field_value:
-                    include_row = False
-                    break
-            
-            if include_row:
-                filtered_data.append(row)
+            if operator == 'equals':
+                keep = [i for i in keep if field_values[i] == filter_value]
+            elif operator == 'contains':
+                keep = [i for i in keep if filter_value in field_values[i]]
+            elif operator == 'not_empty':
+                keep = [i for i in keep if field_values[i]]
         
-        return filtered_data
+        return data.take(keep)
 
     def _log_sync_start(self, sync):
         log = SyncLog(
@@ -192,23 +588,30 @@ class SyncEngine:
         )
         db.session.add(log)
         db.session.commit()
+        return log
 
-    def _log_sync_success(self, sync):
+    def _log_sync_success(self, sync, rows_processed=0, duration_seconds=None, rows_changed=None):
         log = SyncLog(
             sync_id=sync.id,
             status='completed',
             message='Sync completed successfully',
+            rows_processed=rows_processed,
+            rows_changed=rows_changed,
+            duration_seconds=duration_seconds,
             created_at=datetime.utcnow()
         )
         db.session.add(log)
         db.session.commit()
+        return log
 
-    def _log_sync_error(self, sync, error_message):
+    def _log_sync_error(self, sync, error_message, duration_seconds=None):
         log = SyncLog(
             sync_id=sync.id,
             status='error',
             message=f'Sync failed: {error_message}',
+            duration_seconds=duration_seconds,
             created_at=datetime.utcnow()
         )
         db.session.add(log)
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+        return log
\ No newline at end of file
@@ -0,0 +1,143 @@
+# services/transform_pool.py
+"""Notion property flattening, optionally run in worker processes.
+
+This module only imports the standard library so spawned workers start
+quickly; it must not import the models or any API client.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Sequence, Tuple
+
+# (notion_field, column_position) pairs for the mapped properties
+Fields = Sequence[Tuple[str, int]]
+# (row_index, column_position, notion_field, relation_property) left for the caller to resolve
+RelationCell = Tuple[int, int, str, Dict]
+
+
+def title_text(title_property: Dict) -> str:
+    """Extract plain text from Notion title property"""
+    try:
+        return ''.join([t.get('plain_text', '') for t in title_property.get('title', [])])
+    except Exception:
+        return ''
+
+
+def rich_text(rich_text_property: Dict) -> str:
+    """Extract plain text from Notion rich text property"""
+    try:
+        return ''.join([rt.get('plain_text', '') for rt in rich_text_property.get('rich_text', [])])
+    except Exception:
+        return ''
+
+
+def flatten_property(value: Dict) -> Any:
+    """Sheet cell value for a non-relation Notion property"""
+    if value.get('type') == 'title':
+        return title_text(value)
+    elif value.get('type') == 'rich_text':
+        return rich_text(value)
+    elif value.get('type') == 'number':
+        return value.get('number', '')
+    elif value.get('type') == 'select':
+        return value.get('select', {}).get('name', '')
+    elif value.get('type') == 'date':
+        date_obj = value.get('date', {})
+        return date_obj.get('start', '') if date_obj else ''
+    return str(value.get('plain_text', ''))
+
+
+def flatten_pages(pages: List[Dict], fields: Fields, width: int) -> Tuple[List[list], List[RelationCell]]:
+    """Flatten page properties into row records of ``width`` cells.
+
+    ``pages`` holds each page's ``properties``. Relation cells are left empty
+    and returned separately, since resolving them needs API calls.
+    """
+    records = []
+    relations = []
+    for row_index, properties in enumerate(pages):
+        record = [''] * width
+        for notion_field, position in fields:
+            value = properties.get(notion_field) or {}
+            if value.get('type') == 'relation':
+                relations.append((row_index, position, notion_field, value))
+            else:
+                record[position] = flatten_property(value)
+        records.append(record)
+    return records, relations
+
+
+class TransformPool:
+    """Runs ``flatten_pages`` in worker processes for large batches.
+
+    Only the mapped properties of each page are shipped to the workers.
+    Batches under ``min_batch_rows`` (and every batch when ``max_workers``
+    is 0) are flattened in-process, where pickling would cost more than it
+    saves. A broken pool falls back to in-process work too.
+    """
+
+    CHUNK_ROWS = 500
+
+    def __init__(self, max_workers: int = 0, min_batch_rows: int = 1000):
+        self.max_workers = max_workers
+        self.min_batch_rows = min_batch_rows
+        self._executor = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def flatten(self, pages: List[Dict], fields: Fields, width: int) -> Tuple[List[list], List[RelationCell]]:
+        """Flatten Notion pages into row records, see ``flatten_pages``"""
+        field_names = [notion_field for notion_field, _ in fields]
+        properties = [
+            {name: page.get('properties', {}).get(name) for name in field_names}
+            for page in pages
+        ]
+        if not self.enabled or len(properties) < self.min_batch_rows:
+            return flatten_pages(properties, fields, width)
+
+        chunks = [properties[i:i + self.CHUNK_ROWS] for i in range(0, len(properties), self.CHUNK_ROWS)]
+        try:
+            results = list(self._get_executor().map(
+                flatten_pages, chunks, [fields] * len(chunks), [width] * len(chunks)
+            ))
+        except BrokenProcessPool:
+            self.logger.warning("Transform pool broke, flattening in-process")
+            self._reset()
+            return flatten_pages(properties, fields, width)
+
+        records = []
+        relations = []
+        for chunk_index, (chunk_records, chunk_relations) in enumerate(results):
+            offset = chunk_index * self.CHUNK_ROWS
+            records.extend(chunk_records)
+            relations.extend((row + offset, position, field, value)
+                             for row, position, field, value in chunk_relations)
+        return records, relations
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers don't inherit the parent's threads, locks or DB connections
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,59 @@
+# worker.py
+"""Standalone scheduler process.
+
+Loads only the models and the sync engine; the web app (JWT, CORS, routes)
+is never imported, so workers start quickly and can be scaled out on their own.
+
+    python worker.py
+"""
+import logging
+import signal
+import sys
+from flask import Flask
+from config import Config
+from extensions import db
+
+def create_worker_app() -> Flask:
+    """Minimal Flask app that only provides the database session"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logger = logging.getLogger('worker')
+
+    app = create_worker_app()
+
+    from scheduler.sync_scheduler import SyncScheduler
+    scheduler = SyncScheduler(app)
+
+    # Provider budgets must be counted across the web app and every worker,
+    # or together they can exceed the upstream rate limits
+    if not scheduler.quota.shared and not Config.WORKER_ALLOW_LOCAL_QUOTA:
+        logger.error(
+            "Refusing to start: API quota would be tracked in this process only. "
+            "Set QUOTA_BACKEND=redis with a reachable REDIS_URL, or WORKER_ALLOW_LOCAL_QUOTA=true "
+            "for a single-process setup."
+        )
+        scheduler.stop()
+        sys.exit(1)
+
+    def shutdown(signum, frame):
+        logger.info(f"Received signal {signum}, stopping after the current tick")
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    if Config.WORKER_METRICS_PORT:
+        from services.metrics import start_metrics_server
+        start_metrics_server(Config.WORKER_METRICS_PORT)
+        logger.info(f"Serving worker metrics on port {Config.WORKER_METRICS_PORT}")
+
+    scheduler.run_forever()
+
+if __name__ == '__main__':
+    main()